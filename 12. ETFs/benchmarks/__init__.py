@@ -0,0 +1 @@
+"""Benchmark harness and synthetic data for etfs_analysis."""
@@ -0,0 +1,92 @@
+"""Check that the NumPy and Numba kernel backends agree on synthetic data.
+
+Run from the project root:
+
+    python -m benchmarks.check_backends --tickers 100 --years 10
+
+Exits non-zero if any kernel differs by more than --atol, or if Numba is
+not installed.
+"""
+
+import argparse
+import json
+import sys
+
+import numpy as np
+import pandas as pd
+
+from etfs_analysis import kernels
+from etfs_analysis.prep import build_returns_panel
+from etfs_analysis.optimization import estimate_factor_model
+from etfs_analysis.simulation import simulate_portfolios, simulate_fixed_portfolio_horizons
+
+from .synthetic import generate_factors, generate_etf_returns
+
+
+def _outputs(panel, factors, seed):
+    values = panel.to_numpy(dtype=float)
+    mkt = factors["mktrf"].reindex(panel.index).to_numpy(dtype=float) / 100.0
+    rng = np.random.default_rng(seed)
+    cols = rng.choice(values.shape[1], size=min(10, values.shape[1]), replace=False)
+    port = kernels.nanmean_rows(values, cols)
+    starts = np.sort(rng.integers(0, len(port) // 2, size=50))
+    stops = starts + len(port) // 3
+
+    sim = simulate_portfolios(panel, mkt_ret=factors["mktrf"] / 100.0, n_portfolios=50, random_state=seed)
+    horizons = simulate_fixed_portfolio_horizons(panel, list(panel.columns[:10]), 2, random_state=seed)
+    betas, _, idio_var = estimate_factor_model(panel, factors.drop(columns=["rf"]))
+    return {
+        "max_drawdown": np.array([kernels.max_drawdown(values[:, j]) for j in range(values.shape[1])]),
+        "nanmean_rows": port,
+        "ols_beta": np.array(kernels.ols_beta(port, mkt)),
+        "ols_multi": np.column_stack([betas.to_numpy(), idio_var.to_numpy()]),
+        "window_sums": kernels.window_sums(port, starts, stops),
+        "simulate_portfolios": sim.select_dtypes("number").to_numpy(dtype=float),
+        "simulate_fixed_portfolio_horizons": horizons.select_dtypes("number").to_numpy(dtype=float),
+    }
+
+
+def check_backends(n_tickers=100, n_years=10, seed=0, atol=1e-10):
+    """Run every kernel under both backends and report the max abs difference."""
+    factors = generate_factors(n_years, seed=seed)
+    df_etf = generate_etf_returns(n_tickers, n_years, seed=seed, factors=factors)
+    factors["date"] = pd.to_datetime(factors["date"])
+    factors = factors.set_index("date")
+    panel = build_returns_panel(df_etf, df_etf["TICKER"].unique())
+
+    previous = kernels._state["backend"]
+    try:
+        kernels.set_backend("numpy")
+        ref = _outputs(panel, factors, seed)
+        kernels.set_backend("numba")
+        out = _outputs(panel, factors, seed)
+    finally:
+        kernels._state["backend"] = previous
+
+    report = {}
+    for name, expected in ref.items():
+        got = out[name]
+        same_nan = bool(np.array_equal(np.isnan(expected), np.isnan(got)))
+        diff = float(np.nanmax(np.abs(expected - got), initial=0.0))
+        report[name] = {"max_abs_diff": diff, "same_nan": same_nan, "ok": same_nan and diff <= atol}
+    return report
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--tickers", type=int, default=100)
+    parser.add_argument("--years", type=int, default=10)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--atol", type=float, default=1e-10)
+    args = parser.parse_args(argv)
+
+    if not kernels.numba_available():
+        print("numba is not installed; nothing to compare", file=sys.stderr)
+        return 1
+    report = check_backends(args.tickers, args.years, seed=args.seed, atol=args.atol)
+    print(json.dumps(report, indent=2))
+    return 0 if all(r["ok"] for r in report.values()) else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
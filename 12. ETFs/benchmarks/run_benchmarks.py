@@ -0,0 +1,280 @@
+"""Time the etfs_analysis hot paths on synthetic data and emit JSON.
+
+Run from the project root, e.g.:
+
+    python -m benchmarks.run_benchmarks --tickers 500 --years 20 --output bench.json
+"""
+
+import argparse
+import json
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime, timezone
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from etfs_analysis.io import load_etf_returns, load_factors, load_etf_universe
+from etfs_analysis.prep import build_returns_panel
+from etfs_analysis.optimization import (
+    annualize_stats,
+    estimate_factor_model,
+    factor_model_cov,
+    optimize_min_variance,
+    optimize_target_return,
+    optimize_max_sharpe,
+    optimize_long_only,
+)
+from etfs_analysis.simulation import simulate_portfolios, simulate_fixed_portfolio_horizons
+from etfs_analysis.analysis import top_portfolio_overlap
+from etfs_analysis import kernels
+from etfs_analysis.masked import MaskedPanel
+
+from .synthetic import dataset_paths, write_dataset
+
+BASE_DIR = Path(__file__).resolve().parents[1]
+
+
+def _timeit(fn, repeat):
+    """Run fn repeat times; return the last result and the wall-clock timings."""
+    times = []
+    result = None
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        result = fn()
+        times.append(time.perf_counter() - t0)
+    return result, times
+
+
+def _summary(times):
+    return {"min": min(times), "median": float(np.median(times)), "times": times}
+
+
+def time_imports(repeat=3):
+    """Time cold imports in fresh interpreters (package, light and full)."""
+    statements = {
+        "import_package": "import etfs_analysis",
+        "import_io": "import etfs_analysis.io",
+        "import_full": "from etfs_analysis import *",
+    }
+    results = {}
+    for name, stmt in statements.items():
+        code = f"import time; t0 = time.perf_counter(); {stmt}; print(time.perf_counter() - t0)"
+        times = []
+        for _ in range(repeat):
+            out = subprocess.run([sys.executable, "-c", code], cwd=BASE_DIR, capture_output=True, text=True, check=True)
+            times.append(float(out.stdout.strip()))
+        results[name] = _summary(times)
+    return results
+
+
+def precision_report(panel, mkt_ret, n_portfolios=100, etf_counts=(5, 10, 20), low="float32"):
+    """Memory saved and metric error of a reduced-precision panel vs float64."""
+    hi = panel.astype(np.float64)
+    lo = panel.astype(low)
+    sim_hi = simulate_portfolios(hi, mkt_ret=mkt_ret, n_portfolios=n_portfolios, etf_counts=etf_counts)
+    sim_lo = simulate_portfolios(lo, mkt_ret=mkt_ret, n_portfolios=n_portfolios, etf_counts=etf_counts)
+    _, cov_hi = annualize_stats(hi)
+    _, cov_lo = annualize_stats(lo, dtype=low)
+    metric_err = {}
+    for col in ("ann_return", "ann_vol", "sharpe", "max_dd", "beta", "idio_share"):
+        if col in sim_hi.columns:
+            metric_err[col] = float(np.nanmax(np.abs(sim_hi[col].to_numpy() - sim_lo[col].to_numpy())))
+    cov_diff = np.abs(cov_hi.to_numpy() - cov_lo.to_numpy().astype(np.float64))
+    return {
+        "dtype": low,
+        "panel_bytes": {"float64": int(hi.memory_usage(index=False).sum()), low: int(lo.memory_usage(index=False).sum())},
+        "cov_bytes": {"float64": int(cov_hi.to_numpy().nbytes), low: int(cov_lo.to_numpy().nbytes)},
+        "max_abs_error": metric_err,
+        "cov_max_rel_error": float(np.nanmax(cov_diff) / np.nanmax(np.abs(cov_hi.to_numpy()))),
+    }
+
+
+def _git_commit():
+    try:
+        out = subprocess.run(["git", "rev-parse", "HEAD"], cwd=BASE_DIR, capture_output=True, text=True, timeout=10)
+    except Exception:
+        return None
+    return out.stdout.strip() or None
+
+
+def _metadata():
+    return {
+        "timestamp": datetime.now(timezone.utc).isoformat(),
+        "git_commit": _git_commit(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "numpy": np.__version__,
+        "pandas": pd.__version__,
+        "backend": kernels.get_backend(),
+    }
+
+
+def run_benchmarks(n_tickers=50, n_years=10, seed=0, repeat=3, n_portfolios=300,
+                   etf_counts=(5, 10, 20), opt_assets=50, horizon_years=5, data_dir=None, dtype=None,
+                   precision=False):
+    """Generate (or reuse) a synthetic dataset and time each pipeline stage.
+
+    data_dir: directory for the generated CSVs; files are reused when present so
+    repeated runs at the same scale skip generation. Defaults to a temp dir.
+    dtype: panel dtype passed to build_returns_panel and the simulators.
+    precision: also report float32 vs float64 memory and metric errors.
+    """
+    results = time_imports(repeat)
+    shapes = {}
+
+    tmp = None
+    if data_dir is None:
+        tmp = tempfile.TemporaryDirectory()
+        data_dir = tmp.name
+    data_dir = Path(data_dir) / f"t{n_tickers}-y{n_years}-s{seed}"
+    try:
+        paths = dataset_paths(data_dir)
+        if not paths.etf_returns.exists():
+            _, t = _timeit(lambda: write_dataset(data_dir, n_tickers, n_years, seed=seed), 1)
+            results["generate"] = _summary(t)
+
+        df_etf, t = _timeit(lambda: load_etf_returns(paths.etf_returns), repeat)
+        results["load_etf_returns"] = _summary(t)
+        shapes["etf_rows"] = len(df_etf)
+
+        factors, t = _timeit(lambda: load_factors(paths.factors), repeat)
+        results["load_factors"] = _summary(t)
+        universe = load_etf_universe(paths.universe)
+    finally:
+        if tmp is not None:
+            tmp.cleanup()
+
+    tickers = df_etf["TICKER"].dropna().unique()
+    panel, t = _timeit(lambda: build_returns_panel(df_etf, tickers, dtype=dtype), repeat)
+    results["build_returns_panel"] = _summary(t)
+    shapes["panel"] = list(panel.shape)
+    shapes["panel_bytes"] = int(panel.memory_usage(index=False).sum())
+
+    masked, t = _timeit(lambda: MaskedPanel.from_frame(panel), repeat)
+    results["masked_panel"] = _summary(t)
+
+    fac = factors.drop(columns=["rf"])
+    (betas, fac_cov, idio_var), t = _timeit(lambda: estimate_factor_model(panel, fac), repeat)
+    results["estimate_factor_model"] = _summary(t)
+
+    _, t = _timeit(lambda: factor_model_cov(betas, fac_cov, idio_var), repeat)
+    results["factor_model_cov"] = _summary(t)
+
+    _, t = _timeit(lambda: annualize_stats(panel), repeat)
+    results["annualize_stats"] = _summary(t)
+    _, t = _timeit(lambda: annualize_stats(masked), repeat)
+    results["annualize_stats_masked"] = _summary(t)
+
+    # Optimizers run on funds alive over the last three years so every pair overlaps.
+    recent = panel.iloc[-756:]
+    coverage = recent.notna().mean().sort_values(ascending=False)
+    sub_cols = coverage.index[coverage >= 0.99][:opt_assets]
+    mu, cov = annualize_stats(recent[sub_cols])
+    shapes["opt_assets"] = len(sub_cols)
+    target = float(mu.median())
+    optimizers = {
+        "optimize_min_variance": lambda: optimize_min_variance(cov),
+        "optimize_target_return": lambda: optimize_target_return(mu, cov, target),
+        "optimize_max_sharpe": lambda: optimize_max_sharpe(mu, cov),
+        "optimize_long_only": lambda: optimize_long_only(mu, cov),
+    }
+    for name, fn in optimizers.items():
+        _, t = _timeit(fn, repeat)
+        results[name] = _summary(t)
+
+    mkt_ret = factors["mktrf"].astype(float) / 100.0
+    sim, t = _timeit(
+        lambda: simulate_portfolios(panel, mkt_ret=mkt_ret, n_portfolios=n_portfolios, etf_counts=etf_counts,
+                                    dtype=dtype),
+        repeat,
+    )
+    results["simulate_portfolios"] = _summary(t)
+    shapes["portfolios"] = len(sim)
+    _, t = _timeit(
+        lambda: simulate_portfolios(masked, mkt_ret=mkt_ret, n_portfolios=n_portfolios, etf_counts=etf_counts),
+        repeat,
+    )
+    results["simulate_portfolios_masked"] = _summary(t)
+
+    horizon_years = min(horizon_years, max(1, n_years // 2))
+    fixed = list(sub_cols[: max(etf_counts)])
+    _, t = _timeit(lambda: simulate_fixed_portfolio_horizons(panel, fixed, horizon_years, dtype=dtype),
+                  repeat)
+    results["simulate_fixed_portfolio_horizons"] = _summary(t)
+
+    _, t = _timeit(lambda: top_portfolio_overlap(sim, etf_universe=universe), repeat)
+    results["top_portfolio_overlap"] = _summary(t)
+
+    report = {
+        "meta": _metadata(),
+        "config": {
+            "n_tickers": n_tickers,
+            "n_years": n_years,
+            "seed": seed,
+            "repeat": repeat,
+            "n_portfolios": n_portfolios,
+            "etf_counts": list(etf_counts),
+            "opt_assets": opt_assets,
+            "horizon_years": horizon_years,
+            "dtype": dtype or "float64",
+        },
+        "shapes": shapes,
+        "results": results,
+    }
+    if precision:
+        panel64 = build_returns_panel(df_etf, tickers, dtype="float64")
+        report["precision"] = precision_report(panel64, mkt_ret, n_portfolios=n_portfolios, etf_counts=etf_counts)
+    return report
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--tickers", type=int, default=50, help="number of ETFs (e.g. 50-5000)")
+    parser.add_argument("--years", type=int, default=10, help="years of daily history (e.g. 10-45)")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--n-portfolios", type=int, default=300)
+    parser.add_argument("--etf-counts", type=int, nargs="+", default=[5, 10, 20])
+    parser.add_argument("--opt-assets", type=int, default=50, help="assets passed to the optimizers")
+    parser.add_argument("--dtype", choices=("float64", "float32"), default=None, help="panel dtype")
+    parser.add_argument("--precision", action="store_true",
+                        help="report float32 vs float64 memory savings and metric errors")
+    parser.add_argument("--backend", choices=kernels.BACKENDS, default=None, help="kernel backend")
+    parser.add_argument("--data-dir", type=Path, default=None, help="cache generated CSVs here")
+    parser.add_argument("--import-budget", type=float, default=None,
+                        help="fail (exit 1) if `import etfs_analysis` takes longer than this many seconds")
+    parser.add_argument("--output", type=Path, default=None, help="write JSON here instead of stdout")
+    args = parser.parse_args(argv)
+    if args.backend is not None:
+        kernels.set_backend(args.backend)
+
+    report = run_benchmarks(
+        n_tickers=args.tickers,
+        n_years=args.years,
+        seed=args.seed,
+        repeat=args.repeat,
+        n_portfolios=args.n_portfolios,
+        etf_counts=tuple(args.etf_counts),
+        opt_assets=args.opt_assets,
+        data_dir=args.data_dir,
+        dtype=args.dtype,
+        precision=args.precision,
+    )
+    text = json.dumps(report, indent=2)
+    if args.output is None:
+        print(text)
+    else:
+        args.output.write_text(text + "\n")
+    if args.import_budget is not None and report["results"]["import_package"]["min"] > args.import_budget:
+        print(f"import etfs_analysis exceeded budget of {args.import_budget}s", file=sys.stderr)
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,156 @@
+"""Deterministic synthetic CRSP/Fama-French data for benchmarks."""
+
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from etfs_analysis.config import Paths
+
+FACTOR_COLS = ("mktrf", "smb", "hml", "rmw", "cma", "umd")
+ASSET_CLASSES = ("Equity", "Bond", "Commodity", "Real Estate", "Currency", "Multi-Asset")
+SIZES = ("Large-Cap", "Mid-Cap", "Small-Cap", "Micro-Cap")
+
+# Daily factor means/vols in percent, roughly matching 1980-2024 FF data.
+_FACTOR_MEAN = np.array([0.035, 0.005, 0.010, 0.012, 0.012, 0.025])
+_FACTOR_VOL = np.array([1.05, 0.55, 0.60, 0.40, 0.40, 0.75])
+_FACTOR_CORR = np.array([
+    [1.00, 0.15, -0.20, -0.25, -0.30, -0.15],
+    [0.15, 1.00, 0.05, -0.30, 0.00, 0.00],
+    [-0.20, 0.05, 1.00, 0.20, 0.60, -0.25],
+    [-0.25, -0.30, 0.20, 1.00, 0.15, 0.10],
+    [-0.30, 0.00, 0.60, 0.15, 1.00, 0.05],
+    [-0.15, 0.00, -0.25, 0.10, 0.05, 1.00],
+])
+
+
+def business_dates(n_years, start="1980-01-02"):
+    """Weekday calendar covering n_years from start."""
+    start = pd.Timestamp(start)
+    end = start + pd.DateOffset(years=n_years)
+    return pd.bdate_range(start, end, inclusive="left")
+
+
+def ticker_names(n_tickers, prefix="E"):
+    """Deterministic, unique ticker symbols (E0000, E0001, ...)."""
+    width = max(4, len(str(n_tickers - 1)))
+    return [f"{prefix}{i:0{width}d}" for i in range(n_tickers)]
+
+
+def generate_factors(n_years, start="1980-01-02", seed=0):
+    """Generate an FF6-style daily factor file (values in percent)."""
+    rng = np.random.default_rng([seed, 0])
+    dates = business_dates(n_years, start)
+    chol = np.linalg.cholesky(_FACTOR_CORR)
+    z = rng.standard_normal((len(dates), len(FACTOR_COLS))) @ chol.T
+    values = _FACTOR_MEAN + z * _FACTOR_VOL
+    df = pd.DataFrame(np.round(values, 4), columns=list(FACTOR_COLS))
+    df["rf"] = np.round(0.012 + 0.008 * np.sin(np.linspace(0, 3 * np.pi, len(dates))), 4)
+    df.insert(0, "date", dates.strftime("%Y-%m-%d"))
+    return df
+
+
+def generate_etf_returns(n_tickers, n_years, start="1980-01-02", seed=0, factors=None,
+                         missing_rate=0.001, dup_rate=0.0005, non_etf_share=0.02, chunk_size=250):
+    """Generate CRSP-style long daily returns (date, PERMNO, TICKER, SHRCD, RET).
+
+    Returns follow an FF6 factor model with per-ticker betas and idiosyncratic
+    vol. Listing dates are staggered, some funds delist early, a small share of
+    RET values are missing, a few rows are duplicated and a few non-ETF share
+    codes are mixed in so the loader and panel builder exercise their
+    filtering paths.
+    """
+    if factors is None:
+        factors = generate_factors(n_years, start=start, seed=seed)
+    dates = pd.DatetimeIndex(pd.to_datetime(factors["date"]))
+    fac = factors[list(FACTOR_COLS)].to_numpy() / 100.0
+    rf = factors["rf"].to_numpy() / 100.0
+    n_dates = len(dates)
+
+    n_other = int(round(n_tickers * non_etf_share))
+    n_total = n_tickers + n_other
+    rng = np.random.default_rng([seed, 1])
+    tickers = np.array(ticker_names(n_tickers) + ticker_names(n_other, prefix="S"))
+    shrcd = np.r_[np.full(n_tickers, 73), np.full(n_other, 11)]
+
+    betas = rng.normal(0.0, 0.3, size=(n_total, len(FACTOR_COLS)))
+    betas[:, 0] = rng.normal(0.9, 0.35, size=n_total)
+    idio_vol = rng.uniform(0.002, 0.02, size=n_total)
+    listed_from_start = rng.random(n_total) < 0.3
+    first = np.where(listed_from_start, 0, rng.integers(0, max(1, int(n_dates * 0.8)), size=n_total))
+    delisted = rng.random(n_total) < 0.1
+    last = np.where(delisted, rng.integers(first + 1, n_dates + 1), n_dates)
+
+    frames = []
+    for lo in range(0, n_total, chunk_size):
+        hi = min(lo + chunk_size, n_total)
+        crng = np.random.default_rng([seed, 2, lo])
+        ret = rf[:, None] + fac @ betas[lo:hi].T
+        ret += crng.standard_normal((n_dates, hi - lo)) * idio_vol[lo:hi]
+        ret[crng.random(ret.shape) < missing_rate] = np.nan
+        ret = np.round(ret, 6)
+        row = np.arange(n_dates)[:, None]
+        listed = (row >= first[lo:hi]) & (row < last[lo:hi])
+        # CRSP reports no return on the first listing day.
+        ret[row == first[lo:hi]] = np.nan
+        t_idx, c_idx = np.nonzero(listed)
+        c_idx = c_idx + lo
+        frames.append(pd.DataFrame({
+            "PERMNO": 10000 + c_idx,
+            "date": dates[t_idx],
+            "SHRCD": shrcd[c_idx],
+            "TICKER": tickers[c_idx],
+            "RET": ret[listed],
+        }))
+
+    df = pd.concat(frames, ignore_index=True)
+    n_dup = int(len(df) * dup_rate)
+    if n_dup:
+        dup = df.iloc[np.sort(rng.choice(len(df), size=n_dup, replace=False))]
+        df = pd.concat([df, dup], ignore_index=True)
+    return df.sort_values(["date", "PERMNO"], kind="stable").reset_index(drop=True)
+
+
+def generate_universe(tickers, seed=0):
+    """Generate ETF universe metadata with asset_class and sizes categories."""
+    rng = np.random.default_rng([seed, 3])
+    tickers = list(tickers)
+    n = len(tickers)
+    aum = np.round(np.exp(rng.normal(20.0, 2.0, size=n)), -3)
+    adv = np.round(np.exp(rng.normal(12.0, 1.5, size=n)))
+    base = pd.DataFrame({
+        "TICKER": tickers,
+        "NAME": [f"Synthetic ETF {t}" for t in tickers],
+        "AUM": aum,
+        "ADV": adv,
+        "SOURCE": "SYNTHETIC",
+    })
+    asset = base.assign(CATEGORY_TYPE="asset_class",
+                        CATEGORY=np.array(ASSET_CLASSES)[rng.integers(0, len(ASSET_CLASSES), size=n)])
+    sizes = base.assign(CATEGORY_TYPE="sizes",
+                        CATEGORY=np.array(SIZES)[rng.integers(0, len(SIZES), size=n)])
+    return pd.concat([asset, sizes], ignore_index=True)
+
+
+def dataset_paths(out_dir):
+    """Paths of the synthetic CSVs inside out_dir."""
+    out_dir = Path(out_dir)
+    return Paths(
+        etf_returns=out_dir / "etfs-daily.csv",
+        factors=out_dir / "FF-6factors.csv",
+        universe=out_dir / "etf_universe.csv",
+    )
+
+
+def write_dataset(out_dir, n_tickers=50, n_years=10, start="1980-01-02", seed=0):
+    """Write returns, factors and universe CSVs to out_dir and return Paths."""
+    Path(out_dir).mkdir(parents=True, exist_ok=True)
+    paths = dataset_paths(out_dir)
+    factors = generate_factors(n_years, start=start, seed=seed)
+    returns = generate_etf_returns(n_tickers, n_years, start=start, seed=seed, factors=factors)
+    universe = generate_universe(ticker_names(n_tickers), seed=seed)
+    factors.to_csv(paths.factors, index=False)
+    # CRSP marks missing returns with letter codes; the loader coerces them to NaN.
+    returns.to_csv(paths.etf_returns, index=False, na_rep="C", date_format="%Y-%m-%d")
+    universe.to_csv(paths.universe, index=False)
+    return paths
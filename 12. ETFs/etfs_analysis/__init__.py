@@ -1,27 +1,44 @@
-"""ETF analysis framework package."""
-
-from .config import Paths, Settings
-from .io import load_etf_returns, load_factors, load_etf_universe, save_etf_universe
-from .etfdb import build_universe, available_filters, fetch_top_by_category
-from .prep import select_top_etfs_by_category, build_returns_panel
-from .optimization import (
-    annualize_stats,
-    estimate_factor_model,
-    factor_model_cov,
-    factor_correlation,
-    optimize_min_variance,
-    optimize_target_return,
-    optimize_max_sharpe,
-    optimize_long_only,
-)
-from .simulation import (
-    portfolio_metrics,
-    market_vs_idio_risk,
-    simulate_portfolios,
-    sample_horizon_windows,
-    simulate_fixed_portfolio_horizons,
-)
-from .analysis import top_portfolio_overlap
+"""ETF analysis framework package.
+
+Public names are resolved lazily on first access so that importing the
+package (or a light submodule such as ``io`` or ``etfdb``) does not pull in
+pandas, statsmodels or scipy up front.
+"""
+
+from importlib import import_module
+
+_EXPORTS = {
+    "Paths": "config",
+    "Settings": "config",
+    "load_etf_returns": "io",
+    "load_factors": "io",
+    "load_etf_universe": "io",
+    "save_etf_universe": "io",
+    "build_universe": "etfdb",
+    "available_filters": "etfdb",
+    "fetch_top_by_category": "etfdb",
+    "select_top_etfs_by_category": "prep",
+    "build_returns_panel": "prep",
+    "annualize_stats": "optimization",
+    "estimate_factor_model": "optimization",
+    "factor_model_cov": "optimization",
+    "factor_correlation": "optimization",
+    "optimize_min_variance": "optimization",
+    "optimize_target_return": "optimization",
+    "optimize_max_sharpe": "optimization",
+    "optimize_long_only": "optimization",
+    "portfolio_metrics": "simulation",
+    "market_vs_idio_risk": "simulation",
+    "simulate_portfolios": "simulation",
+    "sample_horizon_windows": "simulation",
+    "simulate_fixed_portfolio_horizons": "simulation",
+    "top_portfolio_overlap": "analysis",
+    "set_backend": "kernels",
+    "get_backend": "kernels",
+    "MaskedPanel": "masked",
+}
+
+_SUBMODULES = {"config", "io", "etfdb", "prep", "optimization", "simulation", "analysis", "kernels", "masked"}
 
 __all__ = [
     "Paths",
@@ -49,4 +66,23 @@ __all__ = [
     "sample_horizon_windows",
     "simulate_fixed_portfolio_horizons",
     "top_portfolio_overlap",
+    "set_backend",
+    "get_backend",
+    "MaskedPanel",
 ]
+
+
+def __getattr__(name):
+    """Import the submodule that defines name on first access and cache it."""
+    if name in _SUBMODULES:
+        return import_module(f".{name}", __name__)
+    module = _EXPORTS.get(name)
+    if module is None:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    value = getattr(import_module(f".{module}", __name__), name)
+    globals()[name] = value
+    return value
+
+
+def __dir__():
+    return sorted(set(globals()) | set(__all__))
@@ -24,3 +24,4 @@ class Settings:
     n_portfolios: int = 300
     etf_counts: tuple = (5, 10, 20)
     top_pct: float = 0.05
+    dtype: str = "float64"
@@ -2,7 +2,6 @@
 
 import json
 import urllib.request
-import pandas as pd
 
 _DEFAULT_EXCLUDE = {"watchlist", "overall_rating"}
 
@@ -72,6 +71,8 @@ def fetch_top_by_category(category_field, top_n=10, sort_by="assets", per_page=5
 
     include_fields: optional list of fields to keep from ETFdb records.
     """
+    import pandas as pd
+
     counts = available_filters()
     if category_field not in counts:
         raise ValueError(f"Unknown category_field: {category_field}")
@@ -108,6 +109,8 @@ def fetch_top_by_category(category_field, top_n=10, sort_by="assets", per_page=5
 
 def build_universe(category_fields=("asset_class", "sizes", "investment_styles"), top_n=10, include_fields=None):
     """Build a combined ETF universe across category fields."""
+    import pandas as pd
+
     frames = []
     for field in category_fields:
         frames.append(fetch_top_by_category(field, top_n=top_n, include_fields=include_fields))
@@ -1,7 +1,12 @@
 """IO utilities for ETF analysis data files."""
 
+from __future__ import annotations
+
 from pathlib import Path
-import pandas as pd
+from typing import TYPE_CHECKING
+
+if TYPE_CHECKING:
+    import pandas as pd
 
 
 def load_etf_returns(path: Path, shrcd: int = 73) -> pd.DataFrame:
@@ -10,6 +15,8 @@ def load_etf_returns(path: Path, shrcd: int = 73) -> pd.DataFrame:
     Expected columns: date, RET, TICKER (optionally SHRCD for ETF filter).
     Filters by SHRCD when present and coerces RET to numeric.
     """
+    import pandas as pd
+
     df = pd.read_csv(path)
     if "SHRCD" in df.columns:
         df = df[df["SHRCD"] == shrcd]
@@ -20,6 +27,8 @@ def load_etf_returns(path: Path, shrcd: int = 73) -> pd.DataFrame:
 
 def load_factors(path: Path) -> pd.DataFrame:
     """Load factor CSV with a date column and return a datetime index."""
+    import pandas as pd
+
     df = pd.read_csv(path)
     df.columns = [c.strip().lower() for c in df.columns]
     if "date" not in df.columns:
@@ -30,6 +39,8 @@ def load_factors(path: Path) -> pd.DataFrame:
 
 def load_etf_universe(path: Path) -> pd.DataFrame:
     """Load ETF universe metadata (must include TICKER and CATEGORY)."""
+    import pandas as pd
+
     df = pd.read_csv(path)
     df.columns = [c.strip().upper() for c in df.columns]
     needed = {"TICKER", "CATEGORY"}
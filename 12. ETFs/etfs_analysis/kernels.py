@@ -0,0 +1,329 @@
+"""Numeric kernels for the simulation and optimization hot loops.
+
+Every kernel has a pure-NumPy implementation and, when Numba is installed, a
+JIT-compiled twin with the same semantics. NaNs are treated as missing
+observations throughout, matching pandas' skipna behaviour.
+
+The backend is chosen at runtime: ``set_backend("numpy" | "numba" | "auto")``
+or the ``ETFS_ANALYSIS_BACKEND`` environment variable. "auto" (the default)
+uses Numba when it can be imported. Numba kernels are compiled on first use
+(and cached on disk), so importing this module stays cheap.
+"""
+
+import os
+
+import numpy as np
+
+BACKENDS = ("auto", "numpy", "numba")
+
+_state = {"backend": os.environ.get("ETFS_ANALYSIS_BACKEND", "auto").lower()}
+_numba_kernels = {}
+
+
+def numba_available():
+    """Return True if Numba can be imported."""
+    try:
+        import numba  # noqa: F401
+    except Exception:
+        return False
+    return True
+
+
+def set_backend(name):
+    """Select the kernel backend: "auto", "numpy" or "numba"."""
+    name = str(name).lower()
+    if name not in BACKENDS:
+        raise ValueError(f"backend must be one of {BACKENDS}")
+    if name == "numba" and not numba_available():
+        raise ImportError("Numba backend requested but numba is not installed")
+    _state["backend"] = name
+
+
+def get_backend():
+    """Return the resolved backend name ("numpy" or "numba")."""
+    name = _state["backend"]
+    if name == "auto":
+        return "numba" if numba_available() else "numpy"
+    return name
+
+
+# ---------------------------------------------------------------------------
+# NumPy implementations
+# ---------------------------------------------------------------------------
+
+
+def _max_drawdown_numpy(ret):
+    r = ret[~np.isnan(ret)]
+    if r.size == 0:
+        return np.nan
+    cum = np.cumprod(1.0 + r)
+    peak = np.maximum.accumulate(cum)
+    return float(np.min(cum / peak - 1.0))
+
+
+def _nanmean_rows_numpy(X, cols):
+    sub = X[:, cols]
+    valid = ~np.isnan(sub)
+    total = np.where(valid, sub, 0.0).sum(axis=1, dtype=np.float64)
+    count = valid.sum(axis=1)
+    out = np.full(sub.shape[0], np.nan)
+    np.divide(total, count, out=out, where=count > 0)
+    return out
+
+
+def _ols_beta_numpy(y, x):
+    ok = ~(np.isnan(y) | np.isnan(x))
+    n = int(ok.sum())
+    if n == 0:
+        return np.nan, np.nan, np.nan, np.nan, 0
+    y = y[ok]
+    x = x[ok]
+    xd = x - x.mean()
+    yd = y - y.mean()
+    sxx = xd @ xd
+    beta = np.nan if sxx == 0 else (xd @ yd) / sxx
+    alpha = y.mean() - beta * x.mean()
+    resid = yd - beta * xd
+    return float(alpha), float(beta), float(np.var(resid)), float(sxx / n), n
+
+
+def _ols_multi_numpy(Y, X):
+    T, n_assets = Y.shape
+    k = X.shape[1] + 1
+    Xc = np.column_stack([np.ones(T), X])
+    x_ok = ~np.isnan(Xc).any(axis=1)
+    y_ok = ~np.isnan(Y)
+    coef = np.full((n_assets, k), np.nan)
+    resid_var = np.full(n_assets, np.nan)
+
+    # Columns observed on every usable row share one least-squares solve.
+    full = (y_ok | ~x_ok[:, None]).all(axis=0)
+    if full.any() and x_ok.sum() >= k:
+        A = Xc[x_ok]
+        B = Y[x_ok][:, full]
+        sol = np.linalg.lstsq(A, B, rcond=None)[0]
+        coef[full] = sol.T
+        resid_var[full] = np.var(B - A @ sol, axis=0)
+
+    for j in np.flatnonzero(~full):
+        rows = x_ok & y_ok[:, j]
+        if rows.sum() < k:
+            continue
+        A = Xc[rows]
+        b = Y[rows, j]
+        sol = np.linalg.lstsq(A, b, rcond=None)[0]
+        coef[j] = sol
+        resid_var[j] = np.var(b - A @ sol)
+    return coef, resid_var
+
+
+def _window_sums_numpy(x, starts, stops):
+    prefix = np.concatenate([[0.0], np.cumsum(np.where(np.isnan(x), 0.0, x))])
+    return prefix[stops] - prefix[starts]
+
+
+# ---------------------------------------------------------------------------
+# Numba implementations (compiled lazily)
+# ---------------------------------------------------------------------------
+
+
+def _build_numba_kernels():
+    import numba
+
+    @numba.njit(cache=True)
+    def max_drawdown(ret):
+        cum = 1.0
+        peak = -np.inf
+        mdd = np.inf
+        for v in ret:
+            if np.isnan(v):
+                continue
+            cum *= 1.0 + v
+            if cum > peak:
+                peak = cum
+            dd = cum / peak - 1.0
+            if dd < mdd:
+                mdd = dd
+        return np.nan if mdd == np.inf else mdd
+
+    @numba.njit(cache=True)
+    def nanmean_rows(X, cols):
+        T = X.shape[0]
+        out = np.empty(T)
+        for t in range(T):
+            total = 0.0
+            count = 0
+            for j in cols:
+                v = X[t, j]
+                if not np.isnan(v):
+                    total += v
+                    count += 1
+            out[t] = total / count if count > 0 else np.nan
+        return out
+
+    @numba.njit(cache=True)
+    def ols_beta(y, x):
+        n = 0
+        sx = 0.0
+        sy = 0.0
+        for i in range(y.shape[0]):
+            if np.isnan(y[i]) or np.isnan(x[i]):
+                continue
+            n += 1
+            sx += x[i]
+            sy += y[i]
+        if n == 0:
+            return np.nan, np.nan, np.nan, np.nan, 0
+        mx = sx / n
+        my = sy / n
+        sxx = 0.0
+        sxy = 0.0
+        for i in range(y.shape[0]):
+            if np.isnan(y[i]) or np.isnan(x[i]):
+                continue
+            sxx += (x[i] - mx) ** 2
+            sxy += (x[i] - mx) * (y[i] - my)
+        beta = np.nan if sxx == 0 else sxy / sxx
+        alpha = my - beta * mx
+        ssr = 0.0
+        for i in range(y.shape[0]):
+            if np.isnan(y[i]) or np.isnan(x[i]):
+                continue
+            e = (y[i] - my) - beta * (x[i] - mx)
+            ssr += e * e
+        return alpha, beta, ssr / n, sxx / n, n
+
+    @numba.njit(cache=True)
+    def ols_multi(Y, X):
+        T, n_assets = Y.shape
+        k = X.shape[1] + 1
+        Xc = np.ones((T, k))
+        Xc[:, 1:] = X
+        x_ok = np.ones(T, dtype=np.bool_)
+        for t in range(T):
+            for c in range(k):
+                if np.isnan(Xc[t, c]):
+                    x_ok[t] = False
+        coef = np.full((n_assets, k), np.nan)
+        resid_var = np.full(n_assets, np.nan)
+        for j in range(n_assets):
+            XtX = np.zeros((k, k))
+            Xty = np.zeros(k)
+            n = 0
+            for t in range(T):
+                if not x_ok[t] or np.isnan(Y[t, j]):
+                    continue
+                n += 1
+                for a in range(k):
+                    Xty[a] += Xc[t, a] * Y[t, j]
+                    for b in range(k):
+                        XtX[a, b] += Xc[t, a] * Xc[t, b]
+            if n < k:
+                continue
+            sol = np.linalg.lstsq(XtX, Xty)[0]
+            mean = 0.0
+            for t in range(T):
+                if x_ok[t] and not np.isnan(Y[t, j]):
+                    mean += Y[t, j] - Xc[t] @ sol
+            mean /= n
+            ss = 0.0
+            for t in range(T):
+                if x_ok[t] and not np.isnan(Y[t, j]):
+                    e = Y[t, j] - Xc[t] @ sol - mean
+                    ss += e * e
+            coef[j] = sol
+            resid_var[j] = ss / n
+        return coef, resid_var
+
+    @numba.njit(cache=True)
+    def window_sums(x, starts, stops):
+        prefix = np.empty(x.shape[0] + 1)
+        prefix[0] = 0.0
+        for i in range(x.shape[0]):
+            v = x[i]
+            prefix[i + 1] = prefix[i] + (0.0 if np.isnan(v) else v)
+        out = np.empty(starts.shape[0])
+        for i in range(starts.shape[0]):
+            out[i] = prefix[stops[i]] - prefix[starts[i]]
+        return out
+
+    return {
+        "max_drawdown": max_drawdown,
+        "nanmean_rows": nanmean_rows,
+        "ols_beta": ols_beta,
+        "ols_multi": ols_multi,
+        "window_sums": window_sums,
+    }
+
+
+def _numba(name):
+    if not _numba_kernels:
+        _numba_kernels.update(_build_numba_kernels())
+    return _numba_kernels[name]
+
+
+# ---------------------------------------------------------------------------
+# Public kernels
+# ---------------------------------------------------------------------------
+
+
+def max_drawdown(ret):
+    """Maximum drawdown of compounded returns, skipping NaNs (NaN if none)."""
+    ret = np.ascontiguousarray(ret, dtype=np.float64)
+    if get_backend() == "numba":
+        return float(_numba("max_drawdown")(ret))
+    return _max_drawdown_numpy(ret)
+
+
+def nanmean_rows(X, cols=None):
+    """Equal-weight row average of X[:, cols], ignoring NaNs.
+
+    X may be float32 or float64; sums accumulate in float64 and the result is
+    float64. Rows with no valid observation are NaN.
+    """
+    X = np.asarray(X)
+    if X.dtype not in (np.float32, np.float64):
+        X = X.astype(np.float64)
+    cols = np.arange(X.shape[1]) if cols is None else np.asarray(cols, dtype=np.int64)
+    if get_backend() == "numba":
+        return _numba("nanmean_rows")(X, cols)
+    return _nanmean_rows_numpy(X, cols)
+
+
+def ols_beta(y, x):
+    """Univariate OLS of y on x with intercept over rows where both are finite.
+
+    Returns (alpha, beta, resid_var, x_var, n_obs); variances use ddof=0.
+    """
+    y = np.ascontiguousarray(y, dtype=np.float64)
+    x = np.ascontiguousarray(x, dtype=np.float64)
+    if get_backend() == "numba":
+        alpha, beta, resid_var, x_var, n = _numba("ols_beta")(y, x)
+        return float(alpha), float(beta), float(resid_var), float(x_var), int(n)
+    return _ols_beta_numpy(y, x)
+
+
+def ols_multi(Y, X):
+    """Column-by-column OLS of Y (T x n) on [1, X] (X is T x k), dropping NaN rows.
+
+    Returns (coef, resid_var): coef is n x (k + 1) with the intercept first,
+    resid_var uses ddof=0. Columns with fewer than k + 1 rows are NaN.
+    """
+    Y = np.ascontiguousarray(Y, dtype=np.float64)
+    X = np.ascontiguousarray(X, dtype=np.float64)
+    if get_backend() == "numba":
+        return _numba("ols_multi")(Y, X)
+    return _ols_multi_numpy(Y, X)
+
+
+def window_sums(x, starts, stops):
+    """Sums of x over half-open windows [starts[i], stops[i]), NaNs as zero.
+
+    Uses one running (prefix) sum, so each window costs O(1).
+    """
+    x = np.ascontiguousarray(x, dtype=np.float64)
+    starts = np.asarray(starts, dtype=np.int64)
+    stops = np.asarray(stops, dtype=np.int64)
+    if get_backend() == "numba":
+        return _numba("window_sums")(x, starts, stops)
+    return _window_sums_numpy(x, starts, stops)
@@ -0,0 +1,110 @@
+"""Mask-aware statistics for return panels with missing observations.
+
+A MaskedPanel stores the panel once with missing values zeroed, plus a
+boolean validity mask. Pairwise-complete means and covariances and
+equal-weight portfolio averages then come from matrix products with the mask
+(pair counts are M.T @ M), so no imputed copy of the panel is ever built and
+NaN handling is not repeated on every statistic.
+"""
+
+from dataclasses import dataclass
+
+import numpy as np
+import pandas as pd
+
+
+@dataclass(frozen=True)
+class MaskedPanel:
+    """Date x ticker panel: zero-filled values plus a validity mask."""
+
+    values: np.ndarray
+    mask: np.ndarray
+    index: pd.Index
+    columns: pd.Index
+
+    @classmethod
+    def from_frame(cls, returns, dtype=None):
+        """Build from a panel with NaNs for missing returns (one copy)."""
+        values = returns.to_numpy(dtype=dtype, copy=True)
+        if values.dtype not in (np.float32, np.float64):
+            values = values.astype(np.float64)
+        mask = ~np.isnan(values)
+        values[~mask] = 0
+        return cls(values, mask, returns.index, returns.columns)
+
+    @property
+    def shape(self):
+        return self.values.shape
+
+    @property
+    def dtype(self):
+        return self.values.dtype
+
+    @property
+    def nbytes(self):
+        return self.values.nbytes + self.mask.nbytes
+
+    def select(self, tickers):
+        """Return a MaskedPanel restricted to the given tickers (in order)."""
+        idx = self.columns.get_indexer(tickers)
+        if (idx < 0).any():
+            raise KeyError(f"Unknown tickers: {list(pd.Index(tickers)[idx < 0])}")
+        return MaskedPanel(self.values[:, idx], self.mask[:, idx], self.index, self.columns[idx])
+
+    def to_frame(self):
+        """Rebuild the NaN-filled DataFrame."""
+        out = np.where(self.mask, self.values, np.nan)
+        return pd.DataFrame(out, index=self.index, columns=self.columns)
+
+    def counts(self):
+        """Pairwise observation counts N = M.T @ M."""
+        m = self.mask.astype(np.float64)
+        return m.T @ m
+
+    def mean(self):
+        """Column means over valid observations (NaN where a column is empty)."""
+        total = self.values.sum(axis=0, dtype=np.float64)
+        n = self.mask.sum(axis=0)
+        out = np.full(len(self.columns), np.nan)
+        np.divide(total, n, out=out, where=n > 0)
+        return pd.Series(out, index=self.columns)
+
+    def cov(self, ddof=1, block_rows=4096):
+        """Pairwise-complete covariance with the given ddof.
+
+        Each entry is the true pairwise estimate, divided by N - ddof over
+        that pair's N common dates. This equals DataFrame.cov() for the
+        default ddof=1. With other ddof it differs from DataFrame.cov on
+        panels with gaps, because pandas ignores ddof when NaNs are present.
+
+        Uses S = X.T @ X, A = X.T @ M and N = M.T @ M on zero-filled values
+        centred by their column means; rows are processed in blocks that are
+        upcast to float64 so float32 panels still accumulate in double.
+        """
+        n_cols = len(self.columns)
+        center = np.nan_to_num(self.mean().to_numpy())
+        S = np.zeros((n_cols, n_cols))
+        A = np.zeros((n_cols, n_cols))
+        N = np.zeros((n_cols, n_cols))
+        for lo in range(0, len(self.index), block_rows):
+            m = self.mask[lo:lo + block_rows].astype(np.float64)
+            x = (self.values[lo:lo + block_rows] - center) * m
+            S += x.T @ x
+            A += x.T @ m
+            N += m.T @ m
+        with np.errstate(divide="ignore", invalid="ignore"):
+            cov = (S - A * A.T / N) / (N - ddof)
+        cov[N <= ddof] = np.nan
+        return pd.DataFrame(cov, index=self.columns, columns=self.columns)
+
+    def row_mean(self, cols=None):
+        """Equal-weight average across cols per date (NaN where none valid)."""
+        if cols is None:
+            values, mask = self.values, self.mask
+        else:
+            values, mask = self.values[:, cols], self.mask[:, cols]
+        total = values.sum(axis=1, dtype=np.float64)
+        n = mask.sum(axis=1)
+        out = np.full(len(self.index), np.nan)
+        np.divide(total, n, out=out, where=n > 0)
+        return out
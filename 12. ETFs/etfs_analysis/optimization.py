@@ -2,13 +2,27 @@
 
 import numpy as np
 import pandas as pd
-import statsmodels.api as sm
 
+from . import kernels
+from .masked import MaskedPanel
 
-def annualize_stats(returns, periods_per_year=252):
-    """Return annualized mean and covariance from daily returns."""
+
+def annualize_stats(returns, periods_per_year=252, dtype=None):
+    """Return annualized mean and covariance from daily returns.
+
+    returns may be a DataFrame with NaNs or a MaskedPanel; means skip missing
+    values (as in DataFrame.mean) and covariances are the true pairwise ddof=0
+    estimates over each pair's common dates, accumulated in float64. When NaNs
+    are present this differs from DataFrame.cov(ddof=0), which ignores ddof and
+    divides by N - 1. dtype optionally sets the output dtype.
+    """
+    if not isinstance(returns, MaskedPanel):
+        returns = MaskedPanel.from_frame(returns)
     mu = returns.mean() * periods_per_year
     cov = returns.cov(ddof=0) * periods_per_year
+    if dtype is not None:
+        mu = mu.astype(dtype)
+        cov = cov.astype(dtype)
     return mu, cov
 
 
@@ -21,7 +35,11 @@ def _maybe_scale_factors(factors):
 
 
 def estimate_factor_model(returns, factors, factor_cols=None):
-    """Estimate factor betas and idiosyncratic variances via OLS."""
+    """Estimate factor betas and idiosyncratic variances via OLS.
+
+    Each asset is regressed on a constant plus the factors over the rows where
+    both are observed.
+    """
     if factor_cols is None:
         factor_cols = [c for c in factors.columns if c.lower() not in ("rf",)]
     fac = factors[factor_cols].copy()
@@ -29,15 +47,10 @@ def estimate_factor_model(returns, factors, factor_cols=None):
     aligned = returns.join(fac, how="inner")
     fac = aligned[factor_cols]
     y = aligned[returns.columns]
-    X = sm.add_constant(fac)
-
-    betas = pd.DataFrame(index=returns.columns, columns=factor_cols, dtype=float)
-    idio_var = pd.Series(index=returns.columns, dtype=float)
 
-    for col in y.columns:
-        res = sm.OLS(y[col], X, missing="drop").fit()
-        betas.loc[col] = res.params[factor_cols]
-        idio_var[col] = res.resid.var(ddof=0)
+    coef, resid_var = kernels.ols_multi(y.to_numpy(dtype=float), fac.to_numpy(dtype=float))
+    betas = pd.DataFrame(coef[:, 1:], index=returns.columns, columns=factor_cols)
+    idio_var = pd.Series(resid_var, index=returns.columns)
 
     return betas, fac.cov(ddof=0), idio_var
 
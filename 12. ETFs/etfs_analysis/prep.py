@@ -19,10 +19,13 @@ def select_top_etfs_by_category(df, top_n=5, score_cols=("AUM", "ADV")):
     return out.drop(columns=["_score"])
 
 
-def build_returns_panel(df_etf, tickers, min_history=252, fill_method="none"):
+def build_returns_panel(df_etf, tickers, min_history=252, fill_method="none", dtype=None):
     """Pivot a date x ticker return panel with de-duplication and imputation.
 
-    fill_method options: "none", "mean", "ffill", "zero".
+    fill_method options: "none", "mean", "ffill", "zero". Each fill copies the
+    panel; to keep missing values out of later statistics without imputing,
+    leave "none" and wrap the result with MaskedPanel.from_frame.
+    dtype: optional panel dtype (e.g. "float32" to halve memory on wide panels).
     """
     df = df_etf.copy()
     df = df[df["TICKER"].isin(tickers)]
@@ -34,7 +37,9 @@ def build_returns_panel(df_etf, tickers, min_history=252, fill_method="none"):
     if fill_method == "mean":
         ret = ret.fillna(ret.mean())
     elif fill_method == "ffill":
-        ret = ret.fillna(method="ffill")
+        ret = ret.ffill()
     elif fill_method == "zero":
         ret = ret.fillna(0)
+    if dtype is not None:
+        ret = ret.astype(dtype)
     return ret.sort_index()
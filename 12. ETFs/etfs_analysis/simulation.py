@@ -1,53 +1,79 @@
 """Simulation utilities for portfolio risk/return analysis."""
 
+from functools import partial
+
 import numpy as np
 import pandas as pd
-import statsmodels.api as sm
+
+from . import kernels
+from .masked import MaskedPanel
 
 
 def portfolio_metrics(ret, rf=0.0, periods_per_year=252):
-    """Compute annualized return/vol, Sharpe, and max drawdown."""
-    mean = ret.mean() * periods_per_year
-    vol = ret.std(ddof=0) * np.sqrt(periods_per_year)
+    """Compute annualized return/vol, Sharpe, and max drawdown (NaNs skipped)."""
+    r = np.asarray(ret, dtype=float)
+    valid = r[~np.isnan(r)]
+    if valid.size == 0:
+        return {"ann_return": np.nan, "ann_vol": np.nan, "sharpe": np.nan, "max_dd": np.nan}
+    mean = valid.mean() * periods_per_year
+    vol = valid.std() * np.sqrt(periods_per_year)
     sharpe = np.nan if vol == 0 else (mean - rf) / vol
-    cum = (1 + ret).cumprod()
-    peak = cum.cummax()
-    drawdown = (cum / peak) - 1
-    max_dd = drawdown.min()
-    return {"ann_return": mean, "ann_vol": vol, "sharpe": sharpe, "max_dd": max_dd}
+    return {"ann_return": mean, "ann_vol": vol, "sharpe": sharpe, "max_dd": kernels.max_drawdown(r)}
+
+
+def _panel_values(returns, dtype=None):
+    """Return the panel as a float32/float64 ndarray (dtype overrides)."""
+    values = returns.to_numpy(dtype=dtype)
+    if values.dtype not in (np.float32, np.float64):
+        values = values.astype(np.float64)
+    return values
+
+
+def _risk_decomposition(y, x):
+    """Market/idiosyncratic split from aligned arrays (NaN rows dropped)."""
+    _, beta, idio_var, x_var, n = kernels.ols_beta(y, x)
+    if n == 0:
+        return {"beta": np.nan, "mkt_var": np.nan, "idio_var": np.nan, "idio_share": np.nan}
+    ok = ~(np.isnan(y) | np.isnan(x))
+    total = y[ok].var()
+    idio_share = np.nan if total == 0 else idio_var / total
+    return {"beta": beta, "mkt_var": (beta ** 2) * x_var, "idio_var": idio_var, "idio_share": idio_share}
 
 
 def market_vs_idio_risk(port_ret, mkt_ret):
     """Decompose portfolio variance into market and idiosyncratic components."""
     aligned = pd.concat([port_ret, mkt_ret], axis=1).dropna()
-    if aligned.empty:
-        return {"beta": np.nan, "mkt_var": np.nan, "idio_var": np.nan, "idio_share": np.nan}
-    y = aligned.iloc[:, 0]
-    X = sm.add_constant(aligned.iloc[:, 1])
-    res = sm.OLS(y, X).fit()
-    beta = res.params.iloc[1]
-    mkt_var = (beta ** 2) * aligned.iloc[:, 1].var(ddof=0)
-    idio_var = res.resid.var(ddof=0)
-    total = y.var(ddof=0)
-    idio_share = np.nan if total == 0 else idio_var / total
-    return {"beta": beta, "mkt_var": mkt_var, "idio_var": idio_var, "idio_share": idio_share}
+    return _risk_decomposition(aligned.iloc[:, 0].to_numpy(dtype=float), aligned.iloc[:, 1].to_numpy(dtype=float))
 
 
-def simulate_portfolios(returns, mkt_ret=None, n_portfolios=500, etf_counts=(5, 10, 20), random_state=42):
-    """Simulate equal-weight portfolios across ETF counts."""
+def simulate_portfolios(returns, mkt_ret=None, n_portfolios=500, etf_counts=(5, 10, 20), random_state=42,
+                        dtype=None):
+    """Simulate equal-weight portfolios across ETF counts.
+
+    returns may be a DataFrame with NaNs or a MaskedPanel.
+    dtype: optional working dtype for a DataFrame panel (e.g. "float32");
+    portfolio averages and metrics are still accumulated in float64.
+    """
     rng = np.random.default_rng(random_state)
     tickers = list(returns.columns)
+    if isinstance(returns, MaskedPanel):
+        port_mean = returns.row_mean
+    else:
+        port_mean = partial(kernels.nanmean_rows, _panel_values(returns, dtype))
+    mkt = None
+    if mkt_ret is not None:
+        mkt = mkt_ret.reindex(returns.index).to_numpy(dtype=float)
     results = []
     for k in etf_counts:
         if k > len(tickers):
             continue
         for _ in range(n_portfolios):
             picks = rng.choice(tickers, size=k, replace=False)
-            port_ret = returns[picks].mean(axis=1)
+            port_ret = port_mean(returns.columns.get_indexer(picks))
             metrics = portfolio_metrics(port_ret)
             risk = {}
-            if mkt_ret is not None:
-                risk = market_vs_idio_risk(port_ret, mkt_ret)
+            if mkt is not None:
+                risk = _risk_decomposition(port_ret, mkt)
             results.append({"n_etfs": k, "tickers": ",".join(picks), **metrics, **risk})
     return pd.DataFrame(results)
 
@@ -69,19 +95,57 @@ def sample_horizon_windows(returns, years, n_samples=100, random_state=42):
     return [(pd.Timestamp(s), pd.Timestamp(s) + horizon) for s in starts]
 
 
-def simulate_fixed_portfolio_horizons(returns, tickers, years, n_samples=100, random_state=42):
-    """Simulate a fixed ticker set across random horizon windows."""
+def simulate_fixed_portfolio_horizons(returns, tickers, years, n_samples=100, random_state=42, dtype=None):
+    """Simulate a fixed ticker set across random horizon windows.
+
+    returns may be a DataFrame or a MaskedPanel; dtype is the working dtype
+    for a DataFrame panel (see simulate_portfolios).
+    """
     window_list = sample_horizon_windows(returns, years, n_samples=n_samples, random_state=random_state)
     if not window_list:
         return pd.DataFrame()
-    panel = returns.loc[:, returns.columns.intersection(tickers)]
+    # The equal-weight series does not depend on the window, so build it once
+    # and get each window's moments from running sums.
+    if isinstance(returns, MaskedPanel):
+        panel = returns.select(returns.columns.intersection(tickers))
+        if not panel.index.is_monotonic_increasing:
+            # window bounds come from searchsorted, which needs sorted dates
+            order = np.argsort(panel.index, kind="stable")
+            panel = MaskedPanel(panel.values[order], panel.mask[order], panel.index[order], panel.columns)
+        port_ret = panel.row_mean()
+    else:
+        panel = returns.loc[:, returns.columns.intersection(tickers)].sort_index()
+        port_ret = kernels.nanmean_rows(_panel_values(panel, dtype))
+    valid = ~np.isnan(port_ret)
+    starts = panel.index.searchsorted([s for s, _ in window_list], side="left")
+    stops = panel.index.searchsorted([e for _, e in window_list], side="right")
+    n_obs = kernels.window_sums(valid.astype(float), starts, stops)
+    # running sums of returns centred on the overall mean, so the window
+    # variance does not suffer from cancellation
+    center = np.nanmean(port_ret) if valid.any() else 0.0
+    dev = port_ret - center
+    sum_d = kernels.window_sums(dev, starts, stops)
+    sum_d2 = kernels.window_sums(dev ** 2, starts, stops)
+
+    periods_per_year = 252
     results = []
-    for start, end in window_list:
-        window = panel.loc[(panel.index >= start) & (panel.index <= end)]
-        if window.empty:
+    for i, (start, end) in enumerate(window_list):
+        if stops[i] <= starts[i]:
             continue
-        port_ret = window.mean(axis=1)
-        metrics = portfolio_metrics(port_ret)
+        if n_obs[i] == 0:
+            metrics = portfolio_metrics(port_ret[starts[i]:stops[i]])
+        else:
+            mean_dev = sum_d[i] / n_obs[i]
+            mean = center + mean_dev
+            var = max(sum_d2[i] / n_obs[i] - mean_dev ** 2, 0.0)
+            ann_return = mean * periods_per_year
+            ann_vol = np.sqrt(var * periods_per_year)
+            metrics = {
+                "ann_return": ann_return,
+                "ann_vol": ann_vol,
+                "sharpe": np.nan if ann_vol == 0 else ann_return / ann_vol,
+                "max_dd": kernels.max_drawdown(port_ret[starts[i]:stops[i]]),
+            }
         metrics.update({"start": start, "end": end})
         results.append(metrics)
     return pd.DataFrame(results)
@@ -34,6 +34,7 @@ def main():
         tickers,
         min_history=settings.min_history,
         fill_method="none",
+        dtype=settings.dtype,
     )
 
     factors = None
@@ -44,7 +45,13 @@ def main():
     if factors is not None and "mktrf" in factors.columns:
         mkt_ret = factors["mktrf"].astype(float) / 100.0
 
-    sim = simulate_portfolios(ret_panel, mkt_ret=mkt_ret, n_portfolios=settings.n_portfolios, etf_counts=settings.etf_counts)
+    sim = simulate_portfolios(
+        ret_panel,
+        mkt_ret=mkt_ret,
+        n_portfolios=settings.n_portfolios,
+        etf_counts=settings.etf_counts,
+        dtype=settings.dtype,
+    )
 
     results = top_portfolio_overlap(sim, etf_universe=universe, top_pct=settings.top_pct)
 
@@ -0,0 +1,99 @@
+import numpy as np
+
+import AssetModels
+
+def _chain(K, option_type):
+    # flat strikes and payoff signs over the broadcast shape of K and option_type
+    K, otype = np.broadcast_arrays(np.asarray(K, dtype=float), np.asarray(option_type))
+    if not np.isin(otype, ['call', 'put']).all():
+        raise ValueError("option_type must be 'call' or 'put'")
+    return K.ravel(), np.where(otype.ravel() == 'call', 1.0, -1.0), K.shape
+
+def _shape_like(values, shape):
+    return values[0] if shape == () else values.reshape(shape)
+
+def lattice_price(S0, K, T, r, sigma, option_type, steps=500, q=0, method="binomial", american=True):
+    """
+    American (or European) option prices on a recombining lattice: CRR
+    binomial or Boyle trinomial. K and option_type may be arrays (results
+    take their broadcast shape); the whole chain is rolled back together,
+    one vector operation per time step over (strikes x nodes).
+    """
+    if method not in ("binomial", "trinomial"):
+        raise ValueError("method must be 'binomial' or 'trinomial'")
+    Ks, sign, shape = _chain(K, option_type)
+    dt = T / steps
+    disc = np.exp(-r * dt)
+    growth = np.exp((r - q) * dt)
+    if method == "binomial":
+        u = np.exp(sigma * np.sqrt(dt))
+        p = (growth - 1 / u) / (u - 1 / u)
+        probs = (1 - p, p)
+        # node j of step i sits at S0 u^(2j - i)
+        spots = lambda i: S0 * u ** (2 * np.arange(i + 1) - i)
+    else:
+        u = np.exp(sigma * np.sqrt(2 * dt))
+        a, b = np.exp((r - q) * dt / 2), np.exp(sigma * np.sqrt(dt / 2))
+        pu = ((a - 1 / b) / (b - 1 / b)) ** 2
+        pd = ((b - a) / (b - 1 / b)) ** 2
+        probs = (pd, 1 - pu - pd, pu)
+        # node j of step i sits at S0 u^(j - i)
+        spots = lambda i: S0 * u ** (np.arange(2 * i + 1) - i)
+    if min(probs) < 0:
+        raise ValueError("lattice probabilities are negative; increase steps")
+
+    width = len(probs)
+    V = np.maximum(sign[:, None] * (spots(steps)[None, :] - Ks[:, None]), 0)
+    for i in range(steps - 1, -1, -1):
+        n = V.shape[1] - (width - 1)
+        V = disc * sum(pr * V[:, k:k + n] for k, pr in enumerate(probs))
+        if american:
+            V = np.maximum(V, sign[:, None] * (spots(i)[None, :] - Ks[:, None]))
+    return _shape_like(V[:, 0], shape)
+
+def _basis(x, degree):
+    return np.stack([x ** k for k in range(degree + 1)], axis=-1)
+
+def lsm_price(S0, K, T, r, sigma, option_type, dt=1/50, n_paths=100_000, degree=3, q=0, paths=None, rng=None, shocks="antithetic"):
+    """
+    Longstaff-Schwartz American option prices for a chain of strikes from
+    one set of GBM paths (AssetModels.GBM under r - q, or paths given as an
+    (n_paths x steps) matrix on an even grid from 0 to T). At each exercise
+    date the continuation values of every strike are regressed on
+    polynomials of S / S0 over their in-the-money paths, all strikes in one
+    batched least-squares solve.
+
+    Returns (price, standard error), in the broadcast shape of K and
+    option_type.
+    """
+    Ks, sign, shape = _chain(K, option_type)
+    if paths is None:
+        S = AssetModels.GBM(S0, r - q, sigma, T, dt, n_paths=n_paths, rng=rng, shocks=shocks)
+    else:
+        S = np.asarray(paths, dtype=float)
+    n, N = S.shape
+    disc = np.exp(-r * T / (N - 1))
+
+    payoff = lambda s: np.maximum(sign * (s[:, None] - Ks), 0)
+    cash = payoff(S[:, -1])
+    for i in range(N - 2, 0, -1):
+        cash *= disc
+        exercise = payoff(S[:, i])
+        itm = (exercise > 0).astype(float)
+        X = _basis(S[:, i] / S0, degree)
+        # per-strike normal equations over in-the-money paths, solved as one batch
+        k = degree + 1
+        A = (itm.T @ (X[:, :, None] * X[:, None, :]).reshape(n, k * k)).reshape(-1, k, k)
+        b = (itm * cash).T @ X
+        # strikes with too few in-the-money paths to fit are not exercised at this date
+        fit = itm.sum(axis=0) > degree + 1
+        A += (1e-12 * np.trace(A, axis1=1, axis2=2) + ~fit)[:, None, None] * np.eye(k)
+        coef = np.linalg.solve(A, b[..., None])[..., 0]
+        continuation = X @ coef.T
+        stop = (itm > 0) & fit & (exercise > continuation)
+        cash = np.where(stop, exercise, cash)
+    cash *= disc
+
+    price = np.maximum(cash.mean(axis=0), payoff(np.array([S[0, 0]]))[0])
+    se = cash.std(axis=0, ddof=1) / np.sqrt(n)
+    return _shape_like(price, shape), _shape_like(se, shape)
@@ -1,63 +1,333 @@
+import warnings
+from collections import namedtuple
+
 import numpy as np
+from scipy.signal import lfilter
+from scipy.special import ndtr, ndtri
+from scipy.stats import qmc
+
+# Every model takes n_paths: None returns a single 1-D path (N + 1,), an int
+# returns an (n_paths, N + 1) array with all paths advanced together.
+#
+# rng: None draws from the global np.random state (as before), an int seeds
+# a fresh np.random.Generator, a Generator is used as is.
+# shocks: where the standard normals come from, one of SHOCKS or a callable
+# f(shape, rng) returning standard normals of that shape.
+
+SHOCKS = ("normal", "antithetic", "moment_matched", "sobol")
+
+def make_rng(rng=None):
+    if rng is None or isinstance(rng, (np.random.Generator, np.random.RandomState)):
+        return rng
+    return np.random.default_rng(rng)
+
+def _standard_normal(rng, shape):
+    return np.random.standard_normal(shape) if rng is None else rng.standard_normal(shape)
+
+def _brownian_bridge(Z):
+    # Map (n, N) normals to unit-step increments, spending the first columns on
+    # the coarse shape of the path (W_N, then midpoints) so that low-index
+    # Sobol dimensions carry most of the variance.
+    n, N = Z.shape
+    W = np.zeros((n, N + 1))
+    W[:, N] = np.sqrt(N) * Z[:, 0]
+    k = 1
+    queue = [(0, N)]
+    while queue:
+        left, right = queue.pop(0)
+        if right - left < 2:
+            continue
+        mid = (left + right) // 2
+        a, b = mid - left, right - mid
+        W[:, mid] = (b * W[:, left] + a * W[:, right]) / (a + b) + np.sqrt(a * b / (a + b)) * Z[:, k]
+        k += 1
+        queue += [(left, mid), (mid, right)]
+    return np.diff(W, axis=1)
+
+def normals(shape, rng=None, shocks="normal"):
+    rng = make_rng(rng)
+    if callable(shocks):
+        return np.asarray(shocks(shape, rng), dtype=float)
+    if shocks not in SHOCKS:
+        raise ValueError(f"shocks must be one of {SHOCKS} or a callable")
+    if shocks == "normal" or np.ndim(shape) == 0 or len(shape) < 2:
+        return _standard_normal(rng, shape)
+    n, N = shape[0], shape[1]
+    if shocks == "antithetic":
+        Z = _standard_normal(rng, ((n + 1) // 2,) + tuple(shape[1:]))
+        return np.concatenate([Z, -Z])[:n]
+    if shocks == "moment_matched":
+        Z = _standard_normal(rng, shape)
+        if n < 2:
+            return Z
+        return (Z - Z.mean(axis=0)) / Z.std(axis=0)
+    # scrambled Sobol, one dimension per time step (and trailing index, e.g.
+    # asset), Brownian-bridge ordered in time. Trailing indices must share one
+    # sequence: separately scrambled sequences are strongly correlated.
+    extra = int(np.prod(shape[2:]))
+    seed = rng if rng is not None else np.random.default_rng(np.random.randint(2 ** 32, dtype=np.uint64))
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore", UserWarning)  # balance warning for n not a power of 2
+        U = qmc.Sobol(d=N * extra, scramble=True, seed=seed).random(n)
+    Z = ndtri(U).reshape(n, N, extra)
+    return np.stack([_brownian_bridge(Z[:, :, k]) for k in range(extra)], axis=-1).reshape(shape)
 
-def GBM(S0, mu, sigma, T, dt):
+def _shape(n_paths, N):
+    return N if n_paths is None else (n_paths, N)
+
+def _prepend(X, value):
+    X = np.asarray(X, dtype=float)
+    first = np.full(X.shape[:-1] + (1,), value, dtype=float)
+    return np.concatenate([first, X], axis=-1)
+
+def _ar1(x0, a, b, s, Z):
+    # x[i] = a * x[i-1] + b + s * Z[i-1], run as one linear filter per path
+    Z = np.asarray(Z, dtype=float)
+    x0 = np.broadcast_to(np.asarray(x0, dtype=float), Z.shape[:-1])
+    zi = (a * x0)[..., None]
+    X, _ = lfilter([1.0], [1.0, -a], b + s * Z, axis=-1, zi=zi)
+    return np.concatenate([x0[..., None], X], axis=-1)
+
+def GBM(S0, mu, sigma, T, dt, n_paths=None, rng=None, shocks="normal"):
     N = int(T / dt)
-    t = np.array([i * dt for i in range(N + 1)])
-    W = np.random.normal(0, 1, N)
-    W = np.insert(W, 0, 0)
-    W = np.cumsum(W) * np.sqrt(dt)
+    t = np.arange(N + 1) * dt
+    W = normals(_shape(n_paths, N), rng, shocks)
+    W = _prepend(np.cumsum(W, axis=-1) * np.sqrt(dt), 0.0)
     S = S0 * np.exp((mu - 0.5 * sigma ** 2) * t + sigma * W)
     return S
-    
-def BM(S0, mu, sigma, T, dt):
+
+def BM(S0, mu, sigma, T, dt, n_paths=None, rng=None, shocks="normal"):
     N = int(T / dt)
     t = np.linspace(0, T, N + 1)
-    W = np.random.normal(0, 1, N)
-    W = np.insert(W, 0, 0)
-    W = np.cumsum(W) * np.sqrt(dt)
+    W = normals(_shape(n_paths, N), rng, shocks)
+    W = _prepend(np.cumsum(W, axis=-1) * np.sqrt(dt), 0.0)
     return S0 + mu * t + sigma * W
 
-def OrnsteinUhlenbeck(S0, S_bar, lambda_, sigma, T, dt):
+def OrnsteinUhlenbeck(S0, S_bar, lambda_, sigma, T, dt, n_paths=None, rng=None, shocks="normal"):
     N = int(T / dt)
-    t = np.linspace(0, T, N + 1)
-    S = np.zeros(N + 1)
-    S[0] = S0
-    
+
     exp_neg_lambda_dt = np.exp(-lambda_ * dt)
     mean_factor = S_bar * (1 - exp_neg_lambda_dt)
     std_dev = sigma * np.sqrt((1 - np.exp(-2 * lambda_ * dt)) / (2 * lambda_))
-    
-    for i in range(1, N + 1):
-        S[i] = S[i-1] * exp_neg_lambda_dt + mean_factor + std_dev * np.random.normal()
-    
-    return S
 
-def CIR(r0, lambda_, r_bar, sigma, T, dt):
+    Z = normals(_shape(n_paths, N), rng, shocks)
+    return _ar1(S0, exp_neg_lambda_dt, mean_factor, std_dev, Z)
+
+def _qe_step(v, kappa, theta, sigma, dt, Z):
+    # Andersen's quadratic-exponential step for a square-root process; Z are
+    # standard normals, mapped to uniforms for the exponential branch
+    ekt = np.exp(-kappa * dt)
+    m = theta + (v - theta) * ekt
+    s2 = v * sigma ** 2 * ekt * (1 - ekt) / kappa + theta * sigma ** 2 * (1 - ekt) ** 2 / (2 * kappa)
+    psi = s2 / np.maximum(m, 1e-300) ** 2
+    quad = psi <= 1.5
+    with np.errstate(divide='ignore', invalid='ignore'):
+        inv = 2 / psi
+        b2 = np.where(quad, inv - 1 + np.sqrt(inv) * np.sqrt(np.maximum(inv - 1, 0)), 0.0)
+        a = m / (1 + b2)
+        p = np.where(quad, 0.0, (psi - 1) / (psi + 1))
+        beta = (1 - p) / m
+        U = ndtr(Z)
+        expo = np.where(U <= p, 0.0, np.log((1 - p) / (1 - U)) / beta)
+    return np.where(quad, a * (np.sqrt(b2) + Z) ** 2, expo)
+
+def CIR(r0, lambda_, r_bar, sigma, T, dt, n_paths=None, rng=None, shocks="normal", scheme="euler"):
+    # scheme: "euler" (exact mean, sqrt(r) noise; can fail once r < 0),
+    # "full_truncation" (Euler with r+ in drift and noise, Lord et al.) or
+    # "qe" (Andersen's quadratic-exponential scheme, stays non-negative)
+    if scheme not in ("euler", "full_truncation", "qe"):
+        raise ValueError("scheme must be 'euler', 'full_truncation' or 'qe'")
     N = int(T / dt)
-    t = np.linspace(0, T, N + 1)
-    r = np.zeros(N + 1)
+    n = 1 if n_paths is None else n_paths
+    r = np.zeros((N + 1, n))
     r[0] = r0
-    
+
     exp_neg_lambda_dt = np.exp(-lambda_ * dt)
     mean_factor = r_bar * (1 - exp_neg_lambda_dt)
     std_dev = sigma * np.sqrt((1 - np.exp(-2 * lambda_ * dt)) / (2 * lambda_))
-    
+
+    Z = normals(_shape(n_paths, N), rng, shocks).reshape(n, N).T
     for i in range(1, N + 1):
-        r[i] = r[i-1] * exp_neg_lambda_dt + mean_factor + std_dev * np.sqrt(r[i-1]) * np.random.normal()
-    
-    return r
+        if scheme == "euler":
+            r[i] = r[i-1] * exp_neg_lambda_dt + mean_factor + std_dev * np.sqrt(r[i-1]) * Z[i-1]
+        elif scheme == "full_truncation":
+            pos = np.maximum(r[i-1], 0)
+            r[i] = r[i-1] + lambda_ * (r_bar - pos) * dt + sigma * np.sqrt(pos * dt) * Z[i-1]
+        else:
+            r[i] = _qe_step(r[i-1], lambda_, r_bar, sigma, dt, Z[i-1])
+    if scheme == "full_truncation":
+        r = np.maximum(r, 0)
+
+    return r[:, 0] if n_paths is None else r.T
 
-def Vasicek(r0, alpha, r_bar, sigma, T, dt):
+def Vasicek(r0, alpha, r_bar, sigma, T, dt, n_paths=None, rng=None, shocks="normal"):
     N = int(T / dt)
-    t = np.linspace(0, T, N + 1)
-    r = np.zeros(N + 1)
-    r[0] = r0
-    
+
     exp_neg_alpha_dt = np.exp(-alpha * dt)
     mean_factor = r_bar * (1 - exp_neg_alpha_dt)
     std_dev = sigma * np.sqrt((1 - np.exp(-2 * alpha * dt)) / (2 * alpha))
-    
-    for i in range(1, N + 1):
-        r[i] = r[i-1] * exp_neg_alpha_dt + mean_factor + std_dev * np.random.normal()
-    
-    return r
\ No newline at end of file
+
+    Z = normals(_shape(n_paths, N), rng, shocks)
+    return _ar1(r0, exp_neg_alpha_dt, mean_factor, std_dev, Z)
+
+# Multi-asset models return (N + 1, d) for a single path and
+# (n_paths, N + 1, d) otherwise. corr is a correlation matrix combined with
+# the per-asset sigma, or, with sigma=None, the covariance matrix itself.
+# Paths are built chunk_size at a time (Sobol shocks: all at once) and
+# stored as dtype, so float32 halves the memory of large panels.
+
+def cov_factor(C):
+    C = np.asarray(C, dtype=float)
+    if C.ndim != 2 or C.shape[0] != C.shape[1] or not np.allclose(C, C.T):
+        raise ValueError("correlation/covariance matrix must be square and symmetric")
+    try:
+        return np.linalg.cholesky(C)
+    except np.linalg.LinAlgError:
+        # positive semi-definite (e.g. perfectly correlated assets)
+        w, V = np.linalg.eigh(C)
+        if w.min() < -1e-10 * max(w.max(), 1.0):
+            raise ValueError("correlation/covariance matrix is not positive semi-definite")
+        return V * np.sqrt(np.clip(w, 0, None))
+
+def correlated_normals(n_paths, N, L, rng=None, shocks="normal"):
+    Z = normals((1 if n_paths is None else n_paths, N, L.shape[1]), rng, shocks) @ L.T
+    return Z[0] if n_paths is None else Z
+
+def _covariance(corr, sigma, d):
+    if sigma is None:
+        return np.asarray(corr, dtype=float)
+    sigma = np.broadcast_to(np.asarray(sigma, dtype=float), (d,))
+    return np.asarray(corr, dtype=float) * np.outer(sigma, sigma)
+
+def _multi(step, n_paths, N, d, rng, shocks, dtype, chunk_size):
+    # run step(n, rng) -> (n, N + 1, d) chunk by chunk into one array
+    rng = make_rng(rng)
+    if n_paths is None:
+        return step(None, rng).astype(dtype, copy=False)
+    if shocks == "sobol" or chunk_size is None:
+        chunk_size = n_paths
+    out = np.empty((n_paths, N + 1, d), dtype=dtype)
+    for lo in range(0, n_paths, chunk_size):
+        hi = min(lo + chunk_size, n_paths)
+        out[lo:hi] = step(hi - lo, rng)
+    return out
+
+def MultiGBM(S0, mu, sigma, corr, T, dt, n_paths=None, rng=None, shocks="normal", dtype=np.float64, chunk_size=10_000):
+    N = int(T / dt)
+    d = len(corr)
+    cov = _covariance(corr, sigma, d)
+    L = cov_factor(cov)
+    drift = (np.broadcast_to(np.asarray(mu, dtype=float), (d,)) - 0.5 * np.diag(cov)) * dt
+    S0 = np.broadcast_to(np.asarray(S0, dtype=float), (d,))
+
+    def step(n, rng):
+        dX = correlated_normals(n, N, L, rng, shocks) * np.sqrt(dt) + drift
+        return S0 * np.exp(_prepend(np.cumsum(dX, axis=-2).swapaxes(-1, -2), 0.0).swapaxes(-1, -2))
+
+    return _multi(step, n_paths, N, d, rng, shocks, dtype, chunk_size)
+
+def MultiOU(S0, S_bar, lambda_, sigma, corr, T, dt, n_paths=None, rng=None, shocks="normal", dtype=np.float64, chunk_size=10_000):
+    N = int(T / dt)
+    d = len(corr)
+    cov = _covariance(corr, sigma, d)
+    lambda_ = np.broadcast_to(np.asarray(lambda_, dtype=float), (d,))
+    S_bar = np.broadcast_to(np.asarray(S_bar, dtype=float), (d,))
+    S0 = np.broadcast_to(np.asarray(S0, dtype=float), (d,))
+
+    # exact covariance of one step: cov_ij (1 - exp(-(l_i + l_j) dt)) / (l_i + l_j)
+    lam = lambda_[:, None] + lambda_[None, :]
+    L = cov_factor(cov * -np.expm1(-lam * dt) / lam)
+    a = np.exp(-lambda_ * dt)
+
+    def step(n, rng):
+        eps = correlated_normals(n, N, L, rng, shocks)
+        return np.stack([_ar1(S0[k], a[k], S_bar[k] * (1 - a[k]), 1.0, eps[..., k]) for k in range(d)], axis=-1)
+
+    return _multi(step, n_paths, N, d, rng, shocks, dtype, chunk_size)
+
+def GBM_stream(S0, mu, sigma, T, dt, n_paths, block_size=None, rng=None, shocks="normal"):
+    # Yield (n_paths, m) blocks of GBM prices at steps 1..N, m <= block_size,
+    # keeping only the current log-price between blocks, so memory scales with
+    # n_paths and block_size but not with the number of steps. The default
+    # block holds about 1M values. Sobol shocks need the whole path at once.
+    if shocks == "sobol":
+        raise ValueError("sobol shocks cannot be streamed; use GBM")
+    N = int(T / dt)
+    block_size = max(1, 1_000_000 // n_paths) if block_size is None else block_size
+    rng = make_rng(rng)
+    drift = (mu - 0.5 * sigma ** 2) * dt
+    x = np.full(n_paths, np.log(S0), dtype=float)
+    for lo in range(0, N, block_size):
+        m = min(block_size, N - lo)
+        dX = normals((n_paths, m), rng, shocks) * (sigma * np.sqrt(dt)) + drift
+        X = x[:, None] + np.cumsum(dX, axis=1)
+        x = X[:, -1]
+        yield np.exp(X)
+
+# Calibration from observed series: X holds one series per row, sampled every
+# dt along the last axis (a 1-D X is a single series). Missing values (NaN)
+# drop the pairs (x[t-1], x[t]) they belong to. The exact discretisation
+# x[t] = a x[t-1] + b + s eps[t] with a = exp(-lambda_ dt) is fitted by least
+# squares from lagged sums, every series at once, and mapped back to the
+# model's parameters. Returns Calibration(params, se, n): params and se are
+# dicts keyed like the model's arguments (so Model(x0, **fit.params, T=.., dt=..)
+# simulates the fitted model), n the number of pairs used. Series without
+# mean reversion (a >= 1) give NaN or negative speeds.
+
+Calibration = namedtuple("Calibration", ["params", "se", "n"])
+
+def _ar1_fit(X, cir=False):
+    X = np.asarray(X, dtype=float)
+    x, y = X[..., :-1], X[..., 1:]
+    ok = np.isfinite(x) & np.isfinite(y)
+    if cir:
+        # CIR noise scales with sqrt(x[t-1]): weighted least squares
+        ok &= x > 0
+        w = np.where(ok, 1 / np.where(ok, x, 1.0), 0.0)
+    else:
+        w = ok.astype(float)
+    # sums are taken around each series' mean to avoid cancellation
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore", RuntimeWarning)
+        c = np.nanmean(X, axis=-1, keepdims=True)
+    xc, yc = np.where(ok, x - c, 0.0), np.where(ok, y - c, 0.0)
+    n = ok.sum(axis=-1)
+    Sw, Sx, Sy = w.sum(axis=-1), (w * xc).sum(axis=-1), (w * yc).sum(axis=-1)
+    Sxx, Sxy, Syy = (w * xc * xc).sum(axis=-1), (w * xc * yc).sum(axis=-1), (w * yc * yc).sum(axis=-1)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        det = Sw * Sxx - Sx ** 2
+        a = (Sw * Sxy - Sx * Sy) / det
+        b = (Sy - a * Sx) / Sw
+        s2 = np.maximum(Syy - a * Sxy - b * Sy, 0) / n
+        var_a, var_b, cov_ab = s2 * Sw / det, s2 * Sxx / det, -s2 * Sx / det
+    return a, b, c[..., 0], s2, var_a, var_b, cov_ab, n
+
+def _mean_reverting(X, dt, names, cir=False):
+    a, b, c, s2, var_a, var_b, cov_ab, n = _ar1_fit(X, cir)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        lam = -np.log(a) / dt
+        mean = c + b / (1 - a)
+        g = 2 * lam / (1 - a ** 2)
+        sigma = np.sqrt(s2 * g)
+        # delta method; s2 is independent of (a, b) with variance 2 s2^2 / n
+        se_lam = np.sqrt(var_a) / (a * dt)
+        dm_da, dm_db = b / (1 - a) ** 2, 1 / (1 - a)
+        se_mean = np.sqrt(dm_da ** 2 * var_a + dm_db ** 2 * var_b + 2 * dm_da * dm_db * cov_ab)
+        dlog_g = 1 / (a * np.log(a)) + 2 * a / (1 - a ** 2)
+        se_sigma = sigma * np.sqrt(1 / (2 * n) + (dlog_g / 2) ** 2 * var_a)
+    values = (lam, mean, sigma), (se_lam, se_mean, se_sigma)
+    params, se = ({k: v[()] for k, v in zip(names, vals)} for vals in values)
+    return Calibration(params, se, n[()])
+
+def calibrate_OU(X, dt):
+    # exact Gaussian MLE (conditional on the first value of each series)
+    return _mean_reverting(X, dt, ("lambda_", "S_bar", "sigma"))
+
+def calibrate_Vasicek(X, dt):
+    return _mean_reverting(X, dt, ("alpha", "r_bar", "sigma"))
+
+def calibrate_CIR(X, dt):
+    # exact conditional mean, variance taken proportional to x[t-1]: the MLE of
+    # the "euler" CIR scheme above and a quasi-MLE of the true CIR process.
+    # Non-positive values are dropped like missing ones.
+    return _mean_reverting(X, dt, ("lambda_", "r_bar", "sigma"), cir=True)
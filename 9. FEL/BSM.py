@@ -1,7 +1,12 @@
 import numpy as np
 from scipy import stats
-from math import log, sqrt, exp
+from math import erfc, exp, log, pi, sqrt
 import AssetModels
+import BSMv
+import Hedging
+
+SQRT2 = sqrt(2)
+SQRT2PI = sqrt(2 * pi)
 
 def d1(S0, K, T, r, sigma, q=0):
     if T == 0:
@@ -14,25 +19,28 @@ def d2(S0, K, T, r, sigma, q=0):
 def delta(S0, K, T, r, sigma, option_type, q=0):
     d1_val = d1(S0, K, T, r, sigma, q)
     if option_type == 'call':
-        return stats.norm.cdf(d1_val)
+        return exp(-q * T) * stats.norm.cdf(d1_val)
     elif option_type == 'put':
-        return stats.norm.cdf(d1_val) - 1
+        return exp(-q * T) * (stats.norm.cdf(d1_val) - 1)
 
-def gamma(S0, K, T, r, sigma):
-    d1_val = d1(S0, K, T, r, sigma)
-    return stats.norm.pdf(d1_val) / (S0 * sigma * sqrt(T))
+def gamma(S0, K, T, r, sigma, q=0):
+    d1_val = d1(S0, K, T, r, sigma, q)
+    return exp(-q * T) * stats.norm.pdf(d1_val) / (S0 * sigma * sqrt(T))
 
-def vega(S0, K, T, r, sigma):
-    d1_val = d1(S0, K, T, r, sigma)
-    return S0 * stats.norm.pdf(d1_val) * sqrt(T)
+def vega(S0, K, T, r, sigma, q=0):
+    d1_val = d1(S0, K, T, r, sigma, q)
+    return S0 * exp(-q * T) * stats.norm.pdf(d1_val) * sqrt(T)
 
-def theta(S0, K, T, r, sigma, option_type):
-    d1_val = d1(S0, K, T, r, sigma)
-    d2_val = d2(S0, K, T, r, sigma)
-    return -S0 * stats.norm.pdf(d1_val) * sigma / (2 * sqrt(T)) - r * K * exp(-r * T) * stats.norm.cdf(d2_val) if option_type == 'call' else -S0 * stats.norm.pdf(d1_val) * sigma / (2 * sqrt(T)) + r * K * exp(-r * T) * stats.norm.cdf(-d2_val)
+def theta(S0, K, T, r, sigma, option_type, q=0):
+    d1_val = d1(S0, K, T, r, sigma, q)
+    d2_val = d2(S0, K, T, r, sigma, q)
+    common = -S0 * exp(-q * T) * stats.norm.pdf(d1_val) * sigma / (2 * sqrt(T))
+    if option_type == 'call':
+        return common - r * K * exp(-r * T) * stats.norm.cdf(d2_val) + q * S0 * exp(-q * T) * stats.norm.cdf(d1_val)
+    return common + r * K * exp(-r * T) * stats.norm.cdf(-d2_val) - q * S0 * exp(-q * T) * stats.norm.cdf(-d1_val)
 
-def rho(S0, K, T, r, sigma, option_type):
-    d2_val = d2(S0, K, T, r, sigma)
+def rho(S0, K, T, r, sigma, option_type, q=0):
+    d2_val = d2(S0, K, T, r, sigma, q)
     return K * T * exp(-r * T) * stats.norm.cdf(d2_val) if option_type == 'call' else -K * T * exp(-r * T) * stats.norm.cdf(-d2_val)
 
 def price(S0, K, T, r, sigma, option_type, q=0):
@@ -47,11 +55,43 @@ def price(S0, K, T, r, sigma, option_type, q=0):
     elif option_type == 'put':
         return K * exp(-r * T) * stats.norm.cdf(-d2_val) - S0 * exp(-q * T) * stats.norm.cdf(-d1_val)
 
-def delta_hedge(S0, K, T, r, sigma, option_type, mu, dt, option_pos, path=None, sigma_h=None, sigma_a=None):
+def _ncdf(x):
+    return 0.5 * erfc(-x / SQRT2)
+
+def greeks(S0, K, T, r, sigma, option_type, q=0):
+    # price and all Greeks from a single d1/d2 and discount factor evaluation
+    if option_type not in ['call', 'put']:
+        raise ValueError("option_type must be 'call' or 'put'")
+    if sigma <= 0 or T < 0 or K <= 0 or S0 <= 0:
+        raise ValueError("Invalid parameters")
+    df_q = exp(-q * T)
+    df_r = exp(-r * T)
+    sign = 1 if option_type == 'call' else -1
+    if T == 0:
+        delta_val = sign * (0.5 if S0 == K else float(sign * (S0 - K) > 0))
+        return BSMv.Greeks(float(max(sign * (S0 - K), 0)), delta_val, 0.0, 0.0, 0.0, 0.0)
+    sqrt_T = sqrt(T)
+    sig_t = sigma * sqrt_T
+    d1_val = (log(S0 / K) + (r - q + 0.5 * sigma ** 2) * T) / sig_t
+    d2_val = d1_val - sig_t
+    pdf = exp(-0.5 * d1_val ** 2) / SQRT2PI
+    N1 = _ncdf(sign * d1_val)
+    N2 = _ncdf(sign * d2_val)
+    value = sign * (S0 * df_q * N1 - K * df_r * N2)
+    return BSMv.Greeks(
+        value,
+        sign * df_q * N1,
+        df_q * pdf / (S0 * sig_t),
+        S0 * df_q * pdf * sqrt_T,
+        -S0 * df_q * pdf * sigma / (2 * sqrt_T) - sign * r * K * df_r * N2 + sign * q * S0 * df_q * N1,
+        sign * K * T * df_r * N2,
+    )
+
+def delta_hedge(S0, K, T, r, sigma, option_type, mu, dt, option_pos, path=None, sigma_h=None, sigma_a=None, rng=None):
     sigma_h = sigma_h if sigma_h is not None else sigma
     sigma_a = sigma_a if sigma_a is not None else sigma
 
-    S = AssetModels.GBM(S0, mu, sigma_a, T, dt) if path is None else np.array(path)
+    S = AssetModels.GBM(S0, mu, sigma_a, T, dt, rng=rng) if path is None else np.array(path)
     option_price = price(S0, K, T, r, sigma, option_type)
     N = len(S)
     t = np.linspace(0, T, N)
@@ -82,11 +122,11 @@ def delta_hedge(S0, K, T, r, sigma, option_type, mu, dt, option_pos, path=None,
 
     return pnl * np.exp(-r * T) - option_price * option_pos
 
-def dh_path(S0, K, T, r, sigma, option_type, mu, dt, option_pos, path=None, sigma_h=None, sigma_a=None):
+def dh_path(S0, K, T, r, sigma, option_type, mu, dt, option_pos, path=None, sigma_h=None, sigma_a=None, rng=None):
     sigma_h = sigma_h if sigma_h is not None else sigma
     sigma_a = sigma_a if sigma_a is not None else sigma
 
-    S = AssetModels.GBM(S0, mu, sigma_a, T, dt) if path is None else np.array(path)
+    S = AssetModels.GBM(S0, mu, sigma_a, T, dt, rng=rng) if path is None else np.array(path)
     option_price = price(S0, K, T, r, sigma, option_type)
     N = len(S)
     t = np.linspace(0, T, N)
@@ -123,103 +163,22 @@ def dh_path(S0, K, T, r, sigma, option_type, mu, dt, option_pos, path=None, sigm
 
 
 
-def MC_pnl(S0, K, T, r, sigma, option_type, mu, dt, option_pos, nsim=1000, path=None, sigma_h=None, sigma_a=None):
+def MC_pnl(S0, K, T, r, sigma, option_type, mu, dt, option_pos, nsim=1000, path=None, sigma_h=None, sigma_a=None, rng=None):
     
-    prices = np.zeros(nsim)
-    for i in range(nsim):
-        prices[i] = delta_hedge(S0=S0, K=K, T=T, r=r, sigma=sigma, option_type=option_type, mu=mu, dt=dt, option_pos=option_pos, sigma_h=sigma_h, sigma_a=sigma_a)
+    if path is not None:
+        return np.mean(Hedging.delta_hedge_paths(path, K, T, r, sigma, option_type, option_pos, sigma_h=sigma_h))
+    prices = Hedging.MC_delta_hedge(S0, K, T, r, sigma, option_type, mu, dt, option_pos, nsim=nsim, sigma_h=sigma_h, sigma_a=sigma_a, rng=rng)
     
     return np.mean(prices)
 
+def gamma_hedge(S0, K, T, r, sigma, option_type, mu, dt, option_pos, path=None, sigma_h=None, sigma_a=None, hedge_K=None, hedge_T=None, hedge_type='call', rng=None):
+    sigma_a = sigma_a if sigma_a is not None else sigma
 
+    S = AssetModels.GBM(S0, mu, sigma_a, T, dt, rng=rng) if path is None else np.array(path)
+    return Hedging.gamma_hedge_paths(S, K, T, r, sigma, option_type, option_pos, hedge_K=hedge_K, hedge_T=hedge_T, hedge_type=hedge_type, sigma_h=sigma_h)[0]
 
+def gh_path(S0, K, T, r, sigma, option_type, mu, dt, option_pos, path=None, sigma_h=None, sigma_a=None, hedge_K=None, hedge_T=None, hedge_type='call', rng=None):
+    sigma_a = sigma_a if sigma_a is not None else sigma
 
-
-
-
-
-
-
-
-
-
-
-
-
-
-
-
-
-
-# ################## WORK IN PROGRESS ################
-# def gamma_hedge(S0, K, T, r, sigma, option_type, mu, dt, option_pos, path=None, sigma_h=None, sigma_a=None):
-    
-#     sigma_h = sigma_h if sigma_h is not None else sigma
-#     sigma_a = sigma_a if sigma_a is not None else sigma
-
-#     S = AssetModels.GBM(S0, mu, sigma_a, T, dt) if path is None else np.array(path)
-#     N = len(S)
-#     t = np.linspace(0, T, N)
-#     T_i = T - t
-
-#     hedge_K = S0
-
-#     d1_vals = np.where(
-#         T_i[:-1] == 0,
-#         np.where(S[:-1] > K, float('inf'), np.where(S[:-1] < K, float('-inf'), 0.0)),
-#         (np.log(S[:-1] / K) + (r + 0.5 * sigma_h ** 2) * T_i[:-1]) / (sigma_h * np.sqrt(T_i[:-1]))
-#     )
-#     d1_vals = np.append(
-#         d1_vals, 
-#         float('inf') if S[-1] > K else float('-inf') if S[-1] < K else 0.0
-#     )
-
-#     d1_vals_hedge = np.where(
-#         T_i[:-1] == 0,
-#         np.where(S[:-1] > hedge_K, float('inf'), np.where(S[:-1] < hedge_K, float('-inf'), 0.0)),
-#         (np.log(S[:-1] / hedge_K) + (r + 0.5 * sigma_h ** 2) * T_i[:-1]) / (sigma_h * np.sqrt(T_i[:-1]))
-#     )
-#     d1_vals_hedge = np.append(
-#         d1_vals_hedge, 
-#         float('inf') if S[-1] > hedge_K else float('-inf') if S[-1] < hedge_K else 0.0
-#     )
-
-#     delta_vals = stats.norm.cdf(d1_vals) if option_type == 'call' else stats.norm.cdf(d1_vals) - 1
-#     delta_vals_hedge = stats.norm.cdf(d1_vals_hedge) if option_type == 'call' else stats.norm.cdf(d1_vals_hedge) - 1
-
-#     gamma_vals = np.where(
-#         (T_i > 0) & (S > 0), 
-#         stats.norm.pdf(d1_vals) / (S * sigma_h * np.sqrt(T_i)),
-#         0.0  # Gamma is 0 if T_i or S is 0
-#     )
-
-#     gamma_vals_hedge = np.where(
-#         (T_i > 0) & (S > 0), 
-#         stats.norm.pdf(d1_vals_hedge) / (S * sigma_h * np.sqrt(T_i)),
-#         0.0
-#     )
-
-#     gamma_hedge_units = np.where(
-#         gamma_vals_hedge == 0,
-#         0.0,  # Avoid division by zero
-#         - (gamma_vals * option_pos) / gamma_vals_hedge
-#     )
-
-#     total_delta = delta_vals * option_pos + delta_vals_hedge * gamma_hedge_units
-
-#     delta_diff = np.diff(total_delta, prepend=0)
-
-#     cashflows = delta_diff * S
-
-#     comp_factors = np.exp(r * (T - t)) - 1
-#     interests = cashflows * comp_factors
-
-#     pnl = np.sum(interests) + np.sum(cashflows)
-
-#     if option_type == 'call' and S[-1] > K:
-#         pnl -= K * option_pos
-#     elif option_type == 'put' and S[-1] < K:
-#         pnl += K * option_pos
-
-#     return pnl * np.exp(-r * T) - price(S0, K, T, r, sigma, option_type) * option_pos
-# ################################################
+    S = AssetModels.GBM(S0, mu, sigma_a, T, dt, rng=rng) if path is None else np.array(path)
+    return Hedging.gamma_hedge_paths(S, K, T, r, sigma, option_type, option_pos, hedge_K=hedge_K, hedge_T=hedge_T, hedge_type=hedge_type, sigma_h=sigma_h, return_paths=True)[1][0]
@@ -1,7 +1,11 @@
+from collections import namedtuple
+
 import numpy as np
-from scipy import stats
+from scipy import special, stats
 import AssetModels
 
+Greeks = namedtuple("Greeks", ["price", "delta", "gamma", "vega", "theta", "rho"])
+
 def d1(S0, K, T, r, sigma):
     """
     Vectorized d1 calculation for Black-Scholes-Merton model.
@@ -99,10 +103,85 @@ def rho(S0, K, T, r, sigma, option_type):
     else:  # put
         return -disc_factor * stats.norm.cdf(-d2_val)
 
-def delta_hedge(S0, K, T, r, sigma, option_type, mu, dt, option_pos, path=None, sigma_h=None, sigma_a=None):
+def greeks(S0, K, T, r, sigma, option_type, q=0):
+    """
+    Vectorized price and Greeks from a single d1/d2 and discount factor
+    evaluation, with continuous dividend yield q. option_type may be
+    'call', 'put' or an array of them. Theta is per year, vega and rho
+    per unit of volatility and rate.
+
+    Returns Greeks(price, delta, gamma, vega, theta, rho) of arrays.
+    """
+    S0, K, T, r, sigma, q = (np.asarray(a, dtype=float) for a in (S0, K, T, r, sigma, q))
+    otype = np.asarray(option_type)
+    if not np.isin(otype, ['call', 'put']).all():
+        raise ValueError("option_type must be 'call' or 'put'")
+    if np.any(sigma <= 0) or np.any(T < 0) or np.any(K <= 0) or np.any(S0 <= 0):
+        raise ValueError("Invalid parameters")
+    sign = np.where(otype == 'call', 1.0, -1.0)
+    sqrt_T = np.sqrt(T)
+    return _greeks(S0, K, T, r, q, sigma, sign, sqrt_T, np.exp(-r * T), np.exp(-q * T), (r - q) * T)
+
+def _greeks(S0, K, T, r, q, sigma, sign, sqrt_T, df_r, df_q, carry):
+    # price and Greeks given the expiry terms sqrt(T), exp(-rT), exp(-qT), (r - q)T
+    sig_t = sigma * sqrt_T
+    with np.errstate(divide='ignore', invalid='ignore'):
+        d1_val = (np.log(S0 / K) + carry + 0.5 * sig_t ** 2) / sig_t
+        d1_val = np.where(T == 0, np.sign(np.log(S0 / K)) * np.inf, d1_val)
+        d1_val = np.nan_to_num(d1_val, nan=0.0, posinf=np.inf, neginf=-np.inf)
+        d2_val = d1_val - sig_t
+        pdf = np.exp(-0.5 * d1_val ** 2) / np.sqrt(2 * np.pi)
+        N1 = special.ndtr(sign * d1_val)
+        N2 = special.ndtr(sign * d2_val)
+        gamma_val = np.where(T == 0, 0.0, df_q * pdf / (S0 * sig_t))
+        theta_val = np.where(T == 0, 0.0, -S0 * df_q * pdf * sigma / (2 * sqrt_T))
+    theta_val = theta_val - sign * r * K * df_r * N2 + sign * q * S0 * df_q * N1
+    return Greeks(
+        sign * (S0 * df_q * N1 - K * df_r * N2),
+        sign * df_q * N1,
+        gamma_val,
+        S0 * df_q * pdf * sqrt_T,
+        np.where(T == 0, 0.0, theta_val),
+        sign * K * T * df_r * N2,
+    )
+
+def price_chain(chain, S0, r, q=0, sigma='sigma', strike='K', expiry='T', option_type='option_type'):
+    """
+    Price and Greeks for a whole option chain, one contract per row of the
+    DataFrame chain, calls and puts mixed. Contracts are grouped by expiry:
+    exp(-rT), exp(-qT), sqrt(T) and (r - q)T are computed once per expiry
+    and broadcast across its strikes.
+
+    r, q: scalars or callables of T (e.g. a zero curve), evaluated once
+    per expiry. sigma: column name, scalar or array aligned with chain.
+    strike, expiry, option_type: column names in chain.
+
+    Returns a DataFrame of price and Greeks indexed like chain.
+    """
+    import pandas as pd
+
+    K = chain[strike].to_numpy(dtype=float)
+    T_all = chain[expiry].to_numpy(dtype=float)
+    type_codes, types = pd.factorize(chain[option_type])
+    sig = chain[sigma].to_numpy(dtype=float) if isinstance(sigma, str) else np.broadcast_to(np.asarray(sigma, dtype=float), K.shape)
+    S0 = np.asarray(S0, dtype=float)
+    if type_codes.min(initial=0) < 0 or not np.isin(types, ['call', 'put']).all():
+        raise ValueError("option_type must be 'call' or 'put'")
+    if np.any(sig <= 0) or np.any(T_all < 0) or np.any(K <= 0) or np.any(S0 <= 0):
+        raise ValueError("Invalid parameters")
+
+    inv, expiries = pd.factorize(T_all)
+    r_e = np.broadcast_to(np.asarray(r(expiries) if callable(r) else r, dtype=float), expiries.shape)
+    q_e = np.broadcast_to(np.asarray(q(expiries) if callable(q) else q, dtype=float), expiries.shape)
+    g = _greeks(S0, K, expiries[inv], r_e[inv], q_e[inv], sig, np.where(types == 'call', 1.0, -1.0)[type_codes],
+                np.sqrt(expiries)[inv], np.exp(-r_e * expiries)[inv], np.exp(-q_e * expiries)[inv], ((r_e - q_e) * expiries)[inv])
+    return pd.DataFrame(g._asdict(), index=chain.index)
+
+def delta_hedge(S0, K, T, r, sigma, option_type, mu, dt, option_pos, path=None, sigma_h=None, sigma_a=None, rng=None):
     """
     Vectorized delta hedging simulation.
     Can handle both single paths and arrays of paths.
+    rng: seed or np.random.Generator used when the path is simulated.
     
     Returns PnL for each path.
     """
@@ -110,9 +189,13 @@ def delta_hedge(S0, K, T, r, sigma, option_type, mu, dt, option_pos, path=None,
     sigma_a = sigma if sigma_a is None else sigma_a
     
     # Generate or use provided path(s)
-    S = AssetModels.GBM(S0, mu, sigma_a, T, dt) if path is None else np.asarray(path)
+    S = AssetModels.GBM(S0, mu, sigma_a, T, dt, rng=rng) if path is None else np.asarray(path)
     if S.ndim == 2:
         S = S.squeeze()
+    if S.ndim == 2:
+        # (paths x steps) matrix: hedge every path at once
+        import Hedging
+        return Hedging.delta_hedge_paths(S, K, T, r, sigma, option_type, option_pos, sigma_h=sigma_h)
     
     # Calculate initial option price
     option_price = price(S0, K, T, r, sigma, option_type)
@@ -147,10 +230,11 @@ def delta_hedge(S0, K, T, r, sigma, option_type, mu, dt, option_pos, path=None,
     
     return pnl * np.exp(-r * T) - option_price * option_pos
 
-def dh_path(S0, K, T, r, sigma, option_type, mu, dt, option_pos, path=None, sigma_h=None, sigma_a=None):
+def dh_path(S0, K, T, r, sigma, option_type, mu, dt, option_pos, path=None, sigma_h=None, sigma_a=None, rng=None):
     """
     Vectorized delta hedging simulation that returns the full PnL path.
     Can handle both single paths and arrays of paths.
+    rng: seed or np.random.Generator used when the path is simulated.
     
     Returns the cumulative PnL at each time step.
     """
@@ -158,9 +242,13 @@ def dh_path(S0, K, T, r, sigma, option_type, mu, dt, option_pos, path=None, sigm
     sigma_a = sigma if sigma_a is None else sigma_a
     
     # Generate or use provided path(s)
-    S = AssetModels.GBM(S0, mu, sigma_a, T, dt) if path is None else np.asarray(path)
+    S = AssetModels.GBM(S0, mu, sigma_a, T, dt, rng=rng) if path is None else np.asarray(path)
     if S.ndim == 2:
         S = S.squeeze()
+    if S.ndim == 2:
+        # (paths x steps) matrix: one PnL path per row
+        import Hedging
+        return Hedging.delta_hedge_paths(S, K, T, r, sigma, option_type, option_pos, sigma_h=sigma_h, return_paths=True)[1]
     
     # Calculate initial option price
     option_price = price(S0, K, T, r, sigma, option_type)
@@ -196,4 +284,88 @@ def dh_path(S0, K, T, r, sigma, option_type, mu, dt, option_pos, path=None, sigm
     # Apply discount factor and subtract initial option premium
     pnl_path = pnl_path * np.exp(-r * T) - option_price * option_pos
     
-    return pnl_path
\ No newline at end of file
+    return pnl_path
+
+def _otm_price_vega(sigma, S0, X, T, otm_call):
+    """
+    Black-Scholes price and vega of the out-of-the-money side (call if
+    otm_call, else put) with discounted strike X = K * exp(-r * T).
+    """
+    sqrt_T = np.sqrt(T)
+    d1_val = (np.log(S0 / X) + 0.5 * sigma ** 2 * T) / (sigma * sqrt_T)
+    d2_val = d1_val - sigma * sqrt_T
+    sign = np.where(otm_call, 1.0, -1.0)
+    otm = sign * (S0 * special.ndtr(sign * d1_val) - X * special.ndtr(sign * d2_val))
+    vega_val = S0 * np.exp(-0.5 * d1_val ** 2) / np.sqrt(2 * np.pi) * sqrt_T
+    return otm, vega_val, d1_val, d2_val
+
+def implied_vol(price, S0, K, T, r, option_type, tol=1e-10, max_iter=100, sigma_max=10.0):
+    """
+    Vectorized implied volatility for a whole chain of options.
+    Parameters are scalars or broadcastable arrays; option_type may be
+    'call', 'put' or an array of them.
+
+    Works on the out-of-the-money side (put-call parity) for accuracy, starts
+    from the Corrado-Miller rational guess and runs Halley steps with the
+    analytic vega/volga. Points whose step leaves the current bracket or whose
+    vega vanishes (deep ITM/OTM) take a bisection step instead. Converged
+    points drop out of the iteration.
+
+    Returns NaN where the price violates the no-arbitrage bounds.
+    """
+    price, S0, K, T, r, otype = np.broadcast_arrays(
+        np.asarray(price, dtype=float), np.asarray(S0, dtype=float), np.asarray(K, dtype=float),
+        np.asarray(T, dtype=float), np.asarray(r, dtype=float), np.asarray(option_type))
+    if not np.isin(otype, ['call', 'put']).all():
+        raise ValueError("option_type must be 'call' or 'put'")
+    shape = price.shape
+    price, S0, K, T, r, is_call = (a.ravel() for a in (price, S0, K, T, r, otype == 'call'))
+
+    X = K * np.exp(-r * T)
+    call = np.where(is_call, price, price + S0 - X)
+    otm_call = X >= S0
+    target = np.where(otm_call, call, call - S0 + X)
+
+    sigma = np.full(price.shape, np.nan)
+    valid = (T > 0) & (S0 > 0) & (K > 0) & (call >= np.maximum(S0 - X, 0)) & (call < S0) & (target > 0)
+    idx = np.flatnonzero(valid)
+    if idx.size == 0:
+        return sigma.reshape(shape)[()]
+
+    s, x, t, ot, tgt, c = S0[idx], X[idx], T[idx], otm_call[idx], target[idx], call[idx]
+    # Corrado-Miller initial guess
+    half = c - (s - x) / 2
+    root = np.sqrt(np.maximum(half ** 2 - (s - x) ** 2 / np.pi, 0.0))
+    guess = np.sqrt(2 * np.pi / t) / (s + x) * (half + root)
+    guess = np.clip(np.nan_to_num(guess, nan=0.2), 1e-4, sigma_max / 2)
+
+    lo = np.zeros(idx.size)
+    hi = np.full(idx.size, sigma_max)
+    too_high = _otm_price_vega(hi, s, x, t, ot)[0] < tgt
+    sol = guess
+    active = np.flatnonzero(~too_high)
+    for _ in range(max_iter):
+        if active.size == 0:
+            break
+        g = sol[active]
+        f, v, d1_val, d2_val = _otm_price_vega(g, s[active], x[active], t[active], ot[active])
+        f = f - tgt[active]
+        # price is increasing in sigma: tighten the bracket
+        lo[active] = np.where(f < 0, g, lo[active])
+        hi[active] = np.where(f > 0, g, hi[active])
+        with np.errstate(divide='ignore', invalid='ignore'):
+            newton = f / v
+            volga = v * d1_val * d2_val / g
+            step = newton / (1 - 0.5 * newton * volga / v)
+            new = g - step
+        bad = ~np.isfinite(new) | (new <= lo[active]) | (new >= hi[active]) | (v < 1e-12 * s[active])
+        new = np.where(bad, 0.5 * (lo[active] + hi[active]), new)
+        hit = np.abs(f) <= tol * tgt[active]
+        new = np.where(hit, g, new)
+        sol[active] = new
+        done = hit | (np.abs(new - g) <= tol * g) | (hi[active] - lo[active] <= tol * g)
+        active = active[~done]
+
+    sol[too_high] = np.nan
+    sigma[idx] = sol
+    return sigma.reshape(shape)[()]
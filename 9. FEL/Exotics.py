@@ -0,0 +1,93 @@
+import numpy as np
+
+import AssetModels
+
+class PathAccumulator:
+    """
+    Running statistics of GBM paths fed one (paths x steps) block at a time:
+    arithmetic and geometric averages of the monitored prices (S0 excluded),
+    running min/max, the last price and, for each barrier (level,
+    'up'/'down'), a discrete hit flag and the Brownian-bridge survival
+    probability of the continuously monitored barrier. Memory is O(paths).
+
+    continuous: replace the discrete min/max by the extremes of the Brownian
+    bridge between monitoring dates, drawn exactly (needs rng).
+    """
+
+    def __init__(self, n_paths, S0, sigma, dt, barriers=(), continuous=False, rng=None):
+        self.sigma, self.dt, self.continuous = sigma, dt, continuous
+        self.rng = AssetModels.make_rng(rng)
+        self.count = 0
+        self.total = np.zeros(n_paths)
+        self.log_total = np.zeros(n_paths)
+        self.last = np.full(n_paths, float(S0))
+        self.minimum = np.full(n_paths, float(S0))
+        self.maximum = np.full(n_paths, float(S0))
+        self.barriers = [(float(level), direction) for level, direction in barriers]
+        for _, direction in self.barriers:
+            if direction not in ('up', 'down'):
+                raise ValueError("barrier direction must be 'up' or 'down'")
+        self.hit = {b: np.zeros(n_paths, dtype=bool) for b in self.barriers}
+        self.survival = {b: np.ones(n_paths) for b in self.barriers}
+
+    def update(self, S):
+        S = np.asarray(S, dtype=float)
+        prev = np.concatenate([self.last[:, None], S[:, :-1]], axis=1)
+        x0, x1 = np.log(prev), np.log(S)
+        var = self.sigma ** 2 * self.dt
+        self.count += S.shape[1]
+        self.total += S.sum(axis=1)
+        self.log_total += x1.sum(axis=1)
+        if self.continuous:
+            # exact extremes of the bridge between x0 and x1
+            e = np.sqrt((x1 - x0) ** 2 - 2 * var * np.log(self._uniform(S.shape)))
+            self.minimum = np.minimum(self.minimum, np.exp(0.5 * (x0 + x1 - e)).min(axis=1))
+            e = np.sqrt((x1 - x0) ** 2 - 2 * var * np.log(self._uniform(S.shape)))
+            self.maximum = np.maximum(self.maximum, np.exp(0.5 * (x0 + x1 + e)).max(axis=1))
+        else:
+            self.minimum = np.minimum(self.minimum, S.min(axis=1))
+            self.maximum = np.maximum(self.maximum, S.max(axis=1))
+        for b in self.barriers:
+            level, direction = b
+            h = np.log(level)
+            beyond = S >= level if direction == 'up' else S <= level
+            self.hit[b] |= beyond.any(axis=1)
+            # probability that the bridge crossed h between two dates on the same side
+            d0, d1 = h - x0, h - x1
+            p = np.where(beyond | (prev >= level if direction == 'up' else prev <= level), 1.0, np.exp(-2 * d0 * d1 / var))
+            self.survival[b] *= np.prod(1 - p, axis=1)
+        self.last = S[:, -1].copy()
+        return self
+
+    def _uniform(self, shape):
+        return np.random.random_sample(shape) if self.rng is None else self.rng.random(shape)
+
+    @property
+    def average(self):
+        return self.total / self.count
+
+    @property
+    def geometric_average(self):
+        return np.exp(self.log_total / self.count)
+
+def simulate_stats(S0, mu, sigma, T, dt, n_paths, barriers=(), continuous=False, block_size=None, rng=None, shocks="normal"):
+    """
+    Stream n_paths GBM paths block by block through a PathAccumulator
+    without ever holding a full path matrix.
+    """
+    rng = AssetModels.make_rng(rng)
+    acc = PathAccumulator(n_paths, S0, sigma, dt, barriers=barriers, continuous=continuous, rng=rng)
+    for S in AssetModels.GBM_stream(S0, mu, sigma, T, dt, n_paths, block_size=block_size, rng=rng, shocks=shocks):
+        acc.update(S)
+    return acc
+
+def price_exotic(payoff, S0, r, sigma, T, dt, n_paths, barriers=(), continuous=False, block_size=None, rng=None, shocks="normal"):
+    """
+    Risk-neutral Monte Carlo price of payoff(acc) -> per-path payoffs from
+    the streamed statistics, e.g. lambda a: np.maximum(a.average - K, 0).
+
+    Returns (price, standard error).
+    """
+    acc = simulate_stats(S0, r, sigma, T, dt, n_paths, barriers=barriers, continuous=continuous, block_size=block_size, rng=rng, shocks=shocks)
+    values = np.exp(-r * T) * np.asarray(payoff(acc), dtype=float)
+    return values.mean(), values.std(ddof=1) / np.sqrt(len(values))
@@ -1,47 +1,357 @@
+import warnings
+from collections import namedtuple
+
 import numpy as np
 import pandas as pd
 import statsmodels.api as sm
+from scipy.linalg import solve_triangular
+
+# factors columns: rf, mkt, smb, hml, rmw, cma
+FACTORS = ("mkt", "smb", "hml", "rmw", "cma")
+MODELS = {"CAPM": 1, "FF3": 3, "FF5": 5}
+
+FactorFit = namedtuple("FactorFit", ["alpha", "beta", "tstat", "r2", "n"])
+RollingFit = namedtuple("RollingFit", ["alpha", "beta", "n"])
+FamaMacBeth = namedtuple("FamaMacBeth", ["premia", "se", "tstat", "gammas", "n"])
+SortResult = namedtuple("SortResult", ["returns", "counts", "spreads"])
+
+def _design(factors, model, signal=None):
+    if model not in MODELS:
+        raise ValueError(f"model must be one of {tuple(MODELS)}")
+    X = factors[:, 1:1 + MODELS[model]]
+    if signal is not None:
+        X = np.column_stack((X, signal))
+    return sm.add_constant(X)
 
 def CAPM(rets, factors):
     rf = factors[:, 0]
-    mkt = factors[:, 1]
-    X = sm.add_constant(mkt)
+    X = _design(factors, "CAPM")
     xrets = rets - rf
     model = sm.OLS(xrets, X).fit()
     return model
 
 def FF3(rets, factors):
     rf = factors[:, 0]
-    mkt = factors[:, 1]
-    smb = factors[:, 2]
-    hml = factors[:, 3]
-    X = sm.add_constant(np.column_stack((mkt, smb, hml)))
+    X = _design(factors, "FF3")
     xrets = rets - rf
     model = sm.OLS(xrets, X).fit()
     return model
 
 def FF5(rets, factors):
     rf = factors[:, 0]
-    mkt = factors[:, 1]
-    smb = factors[:, 2]
-    hml = factors[:, 3]
-    rmw = factors[:, 4]
-    cma = factors[:, 5]
-    X = sm.add_constant(np.column_stack((mkt, smb, hml, rmw, cma)))
+    X = _design(factors, "FF5")
     xrets = rets - rf
     model = sm.OLS(xrets, X).fit()
     return model
 
 def signal_cleaner(rets, factors, signal):
     rf = factors[:, 0]
-    mkt = factors[:, 1]
-    smb = factors[:, 2]
-    hml = factors[:, 3]
-    signal = signal
-    X = sm.add_constant(np.column_stack((mkt, smb, hml, signal)))
+    X = _design(factors, "FF3", signal)
     xrets = rets - rf
     model = sm.OLS(xrets, X).fit()
     return model
 
-################# DOUBLE SORT FUNCTION IN PROGRESS #################
-# def double_sort(array):
\ No newline at end of file
+def factor_panel(rets, factors, model="FF3", signal=None):
+    """
+    CAPM / FF3 / FF5 time-series regressions of every column of a (T x
+    assets) return matrix (array or DataFrame) on the same factors, with an
+    optional signal (T,) as an extra regressor as in signal_cleaner.
+
+    Assets with a complete history share one QR factorization of the design
+    matrix; assets with missing returns (NaN) are fitted on their own
+    observations by batched normal equations. Standard errors are the
+    usual OLS ones, as in the statsmodels fits of the single-asset
+    functions.
+
+    Returns FactorFit(alpha, beta, tstat, r2, n): alpha (assets,), beta
+    (assets, factors), tstat (assets, 1 + factors) with the alpha first,
+    r2 and n (observations) (assets,). DataFrame input gives pandas output
+    labelled by asset.
+    """
+    columns = rets.columns if isinstance(rets, pd.DataFrame) else None
+    Y = np.asarray(rets, dtype=float)
+    single = Y.ndim == 1
+    Y = (Y[:, None] if single else Y) - np.asarray(factors[:, 0], dtype=float)[:, None]
+    X = np.asarray(_design(factors, model, signal), dtype=float)
+    T, k = X.shape
+    m = Y.shape[1]
+
+    coef = np.empty((m, k))
+    XtX_inv_diag = np.empty((m, k))
+    rss = np.empty(m)
+    tss = np.empty(m)
+    n = np.empty(m)
+    mask = np.isfinite(Y)
+    full = mask.all(axis=0)
+
+    if full.any():
+        Yf = Y[:, full]
+        Q, R = np.linalg.qr(X)
+        Rinv = solve_triangular(R, np.eye(k))
+        coef[full] = (Rinv @ (Q.T @ Yf)).T
+        XtX_inv_diag[full] = (Rinv ** 2).sum(axis=1)
+        rss[full] = ((Yf - X @ coef[full].T) ** 2).sum(axis=0)
+        tss[full] = ((Yf - Yf.mean(axis=0)) ** 2).sum(axis=0)
+        n[full] = T
+    if not full.all():
+        W = mask[:, ~full].astype(float)
+        Yp = np.where(mask[:, ~full], Y[:, ~full], 0.0)
+        A = (W.T @ (X[:, :, None] * X[:, None, :]).reshape(T, k * k)).reshape(-1, k, k)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            A_inv = np.linalg.pinv(A, hermitian=True)
+            coef[~full] = (A_inv @ (Yp.T @ X)[..., None])[..., 0]
+            XtX_inv_diag[~full] = np.diagonal(A_inv, axis1=1, axis2=2)
+            rss[~full] = (W * (Yp - X @ coef[~full].T) ** 2).sum(axis=0)
+            n[~full] = W.sum(axis=0)
+            mean = Yp.sum(axis=0) / n[~full]
+            tss[~full] = (W * (Yp - mean) ** 2).sum(axis=0)
+        # too few observations to identify the coefficients
+        coef[n < k] = np.nan
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        s2 = rss / (n - k)
+        tstat = coef / np.sqrt(s2[:, None] * XtX_inv_diag)
+        r2 = 1 - rss / tss
+    alpha, beta = coef[:, 0], coef[:, 1:]
+    if single:
+        return FactorFit(alpha[0], beta[0], tstat[0], r2[0], n[0])
+    if columns is not None:
+        names = ["const", *FACTORS[:MODELS[model]]] + (["signal"] if signal is not None else [])
+        alpha, r2, n = (pd.Series(v, index=columns) for v in (alpha, r2, n))
+        beta = pd.DataFrame(beta, index=columns, columns=names[1:])
+        tstat = pd.DataFrame(tstat, index=columns, columns=names)
+    return FactorFit(alpha, beta, tstat, r2, n)
+
+def rolling_betas(rets, factors, window, model="FF3", signal=None, min_periods=None, chunk_size=256):
+    """
+    Rolling-window version of factor_panel: alphas and betas of every asset
+    over the trailing window periods ending at each date, from cumulative
+    sums of the cross products X'X and X'y (so each window costs one
+    difference and one small solve, whatever its length). Missing returns
+    drop out of the windows they fall in; windows with fewer than
+    min_periods observations are NaN. The default, max(k + 1, window // 2)
+    for k regressors including the constant, tolerates gaps; pass
+    min_periods=window to require complete windows. Assets are processed
+    chunk_size at a time to bound memory.
+
+    Returns RollingFit(alpha, beta, n): alpha and n (T, assets), beta (T,
+    assets, factors). DataFrame input gives alpha and n as DataFrames and
+    beta as a DataFrame with (factor, asset) columns.
+    """
+    columns, index = (rets.columns, rets.index) if isinstance(rets, pd.DataFrame) else (None, None)
+    Y = np.asarray(rets, dtype=float)
+    single = Y.ndim == 1
+    Y = (Y[:, None] if single else Y) - np.asarray(factors[:, 0], dtype=float)[:, None]
+    X = np.asarray(_design(factors, model, signal), dtype=float)
+    T, k = X.shape
+    m = Y.shape[1]
+    min_periods = max(k + 1, window // 2) if min_periods is None else max(min_periods, k)
+    XX = (X[:, :, None] * X[:, None, :]).reshape(T, k * k)
+
+    def windowed(Z):
+        # sums over the trailing window ending at each date
+        C = np.concatenate([np.zeros((1,) + Z.shape[1:]), np.cumsum(Z, axis=0)])
+        return C[window:] - C[:-window]
+
+    coef = np.full((T, m, k), np.nan)
+    n = np.zeros((T, m))
+    for lo in range(0, m, chunk_size):
+        cols = slice(lo, min(lo + chunk_size, m))
+        mask = np.isfinite(Y[:, cols])
+        Y0 = np.where(mask, Y[:, cols], 0.0)
+        A = windowed(mask[:, :, None] * XX[:, None, :]).reshape(-1, mask.shape[1], k, k)
+        b = windowed(Y0[:, :, None] * X[:, None, :])
+        count = windowed(mask.astype(float))
+        ok = count >= min_periods
+        A[~ok] = np.eye(k)
+        sol = np.linalg.solve(A, b[..., None])[..., 0]
+        sol[~ok] = np.nan
+        coef[window - 1:, cols] = sol
+        n[window - 1:, cols] = count
+    alpha, beta = coef[..., 0], coef[..., 1:]
+    if single:
+        return RollingFit(alpha[:, 0], beta[:, 0], n[:, 0])
+    if columns is not None:
+        names = [*FACTORS[:MODELS[model]]] + (["signal"] if signal is not None else [])
+        alpha, n = (pd.DataFrame(v, index=index, columns=columns) for v in (alpha, n))
+        beta = pd.concat({name: pd.DataFrame(beta[..., j], index=index, columns=columns) for j, name in enumerate(names)}, axis=1)
+    return RollingFit(alpha, beta, n)
+
+def newey_west_se(x, lags=None):
+    """
+    Newey-West (Bartlett kernel) standard error of the mean of each column
+    of x (T, p), ignoring rows with a NaN. lags defaults to
+    floor(4 (T / 100)^(2/9)).
+    """
+    x = np.asarray(x, dtype=float)
+    x = x[np.isfinite(x).all(axis=1)] if x.ndim == 2 else x[np.isfinite(x)][:, None]
+    T = len(x)
+    lags = int(np.floor(4 * (T / 100) ** (2 / 9))) if lags is None else lags
+    e = x - x.mean(axis=0)
+    S = e.T @ e / T
+    for l in range(1, min(lags, T - 1) + 1):
+        G = e[l:].T @ e[:-l] / T
+        S += (1 - l / (lags + 1)) * (G + G.T)
+    return np.sqrt(np.diag(S) / T)
+
+def fama_macbeth(rets, characteristics, nw_lags=None, min_obs=None):
+    """
+    Fama-MacBeth regressions: in every period, the cross-section of returns
+    rets (T x assets) is regressed on a constant and the characteristics
+    of the assets, all periods solved as one batch of normal equations.
+    Premia are the time-series means of the period slopes, with Newey-West
+    standard errors (nw_lags, default as in newey_west_se).
+
+    characteristics: (T, assets, p) array, or a dict or list of (T x
+    assets) arrays / DataFrames, e.g. rolling_betas output. They are used
+    as given, so lag them (shift(1)) when they are estimated from returns
+    up to the same date. Assets with a missing return or characteristic
+    drop out of that period; periods with fewer than min_obs assets
+    (default p + 2) are skipped.
+
+    Returns FamaMacBeth(premia, se, tstat, gammas, n): premia, se, tstat
+    (1 + p,) with the intercept first, gammas (T, 1 + p) the period
+    coefficients and n (T,) the assets used in each period.
+    """
+    names = None
+    if isinstance(characteristics, dict):
+        names = list(characteristics)
+        characteristics = list(characteristics.values())
+    if isinstance(characteristics, (list, tuple)):
+        Z = np.stack([np.asarray(c, dtype=float) for c in characteristics], axis=-1)
+    else:
+        Z = np.asarray(characteristics, dtype=float)
+        Z = Z[..., None] if Z.ndim == 2 else Z
+    Y = np.asarray(rets, dtype=float)
+    T, m, p = Z.shape
+    k = p + 1
+    min_obs = k + 1 if min_obs is None else max(min_obs, k)
+
+    mask = np.isfinite(Y) & np.isfinite(Z).all(axis=-1)
+    X = np.concatenate([np.ones((T, m, 1)), np.where(mask[..., None], Z, 0.0)], axis=-1) * mask[..., None]
+    Y0 = np.where(mask, Y, 0.0)
+    A = np.einsum('tik,til->tkl', X, X)
+    b = np.einsum('tik,ti->tk', X, Y0)
+    n = mask.sum(axis=1)
+    ok = n >= min_obs
+    A[~ok] = np.eye(k)
+    gammas = np.linalg.solve(A, b[..., None])[..., 0]
+    gammas[~ok] = np.nan
+
+    premia = np.nanmean(gammas, axis=0)
+    se = newey_west_se(gammas, nw_lags)
+    tstat = premia / se
+    if names is not None or isinstance(rets, pd.DataFrame):
+        labels = ["const"] + (names if names is not None else [f"z{j}" for j in range(1, k)])
+        premia, se, tstat = (pd.Series(v, index=labels) for v in (premia, se, tstat))
+        index = rets.index if isinstance(rets, pd.DataFrame) else None
+        gammas = pd.DataFrame(gammas, index=index, columns=labels)
+        n = pd.Series(n, index=index)
+    return FamaMacBeth(premia, se, tstat, gammas, n)
+
+def quantile_buckets(x, q, groups=None, valid=None):
+    """
+    Quantile bucket (0 = lowest, q - 1 = highest) of every entry of x (T x
+    assets) among the assets of its date, or of its (date, group) cell when
+    groups (T x assets, ints >= 0) is given: bucket = floor(rank * q / n).
+    Every date is ranked at once by row-wise argsorts; the order of tied
+    values is arbitrary. Entries that are NaN or not valid get -1.
+    """
+    x = np.asarray(x, dtype=float)
+    T, m = x.shape
+    valid = np.isfinite(x) if valid is None else valid & np.isfinite(x)
+    groups = np.zeros(x.shape, dtype=np.int64) if groups is None else np.asarray(groups, dtype=np.int64)
+    valid = valid & (groups >= 0)
+    # invalid entries go to an extra group that sorts last
+    G = int(groups[valid].max()) + 1 if valid.any() else 1
+    g = np.where(valid, groups, G)
+    order = np.argsort(np.where(valid, x, np.inf), axis=1)
+    if G > 1:
+        rank = np.empty_like(order)
+        np.put_along_axis(rank, order, np.arange(m)[None, :], axis=1)
+        order = np.argsort(g * m + rank, axis=1)
+    counts = np.bincount((np.arange(T)[:, None] * (G + 1) + g).ravel(), minlength=T * (G + 1)).reshape(T, G + 1)
+    starts = np.cumsum(counts, axis=1) - counts
+    g_sorted = np.take_along_axis(g, order, axis=1)
+    pos = np.arange(m)[None, :] - np.take_along_axis(starts, g_sorted, axis=1)
+    b = np.where(g_sorted < G, pos * q // np.take_along_axis(counts, g_sorted, axis=1), -1)
+    out = np.empty_like(b)
+    np.put_along_axis(out, order, b, axis=1)
+    return out
+
+def portfolio_sort(rets, characteristics, q=5, method="independent", weights=None):
+    """
+    Multi-way portfolio sort of a stock-date panel. Each date, stocks are
+    put in quantile buckets on every characteristic (dict or list of T x
+    assets matrices; q an int or one per characteristic), independently on
+    the whole cross-section (method="independent") or each within the
+    buckets of the previous ones (method="conditional"). Only stocks with a
+    return, every characteristic and (if given) a positive weight are
+    sorted. Characteristics are used as given: lag them relative to rets.
+
+    Portfolio returns are equal-weighted, or value-weighted by weights
+    (e.g. lagged market cap), aggregated over all dates with bincount.
+
+    Returns SortResult(returns, counts, spreads): returns and counts (T, q1,
+    q2, ...), empty portfolios NaN; spreads (T, n_characteristics) of the
+    high-minus-low return along each characteristic, averaged over the
+    buckets of the others. DataFrame input gives DataFrames, the portfolio
+    columns labelled by their bucket tuples.
+    """
+    if method not in ("independent", "conditional"):
+        raise ValueError("method must be 'independent' or 'conditional'")
+    names = list(characteristics) if isinstance(characteristics, dict) else None
+    chars = [np.asarray(c, dtype=float) for c in (characteristics.values() if names else characteristics)]
+    names = names or [f"c{j}" for j in range(1, len(chars) + 1)]
+    d = len(chars)
+    qs = [q] * d if np.ndim(q) == 0 else list(q)
+    if len(qs) != d:
+        raise ValueError("q must be an int or one value per characteristic")
+    R = np.asarray(rets, dtype=float)
+    T = R.shape[0]
+
+    valid = np.isfinite(R)
+    for c in chars:
+        valid &= np.isfinite(c)
+    if weights is not None:
+        W = np.asarray(weights, dtype=float)
+        valid &= np.isfinite(W) & (W > 0)
+    else:
+        W = np.ones_like(R)
+
+    buckets = []
+    groups = None
+    for c, qj in zip(chars, qs):
+        b = quantile_buckets(c, qj, groups if method == "conditional" else None, valid)
+        buckets.append(b)
+        if method == "conditional":
+            groups = b if groups is None else groups * qj + b
+    port = np.ravel_multi_index(tuple(np.where(valid, b, 0) for b in buckets), qs)
+    n_port = int(np.prod(qs))
+    cell = (np.arange(T)[:, None] * n_port + port)[valid]
+    size = T * n_port
+    counts = np.bincount(cell, minlength=size)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        returns = np.bincount(cell, (W * R)[valid], size) / np.bincount(cell, W[valid], size)
+    returns = returns.reshape([T] + qs)
+    counts = counts.reshape([T] + qs)
+
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore", RuntimeWarning)
+        spreads = np.column_stack([
+            np.nanmean((np.take(returns, -1, axis=j + 1) - np.take(returns, 0, axis=j + 1)).reshape(T, -1), axis=1)
+            for j in range(d)])
+
+    if isinstance(rets, pd.DataFrame):
+        labels = pd.MultiIndex.from_product([range(qj) for qj in qs], names=names)
+        returns = pd.DataFrame(returns.reshape(T, -1), index=rets.index, columns=labels)
+        counts = pd.DataFrame(counts.reshape(T, -1), index=rets.index, columns=labels)
+        spreads = pd.DataFrame(spreads, index=rets.index, columns=names)
+    return SortResult(returns, counts, spreads)
+
+def double_sort(rets, first, second, q=5, method="independent", weights=None):
+    """
+    Two-way portfolio_sort on first and second (conditional: second within
+    the buckets of first).
+    """
+    return portfolio_sort(rets, {"first": first, "second": second}, q, method, weights)
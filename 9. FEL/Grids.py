@@ -0,0 +1,212 @@
+import numpy as np
+
+import BSMv
+
+def _axis(lo, hi, h):
+    if hi <= lo or h <= 0:
+        return np.array([lo], dtype=float)
+    n = int(np.ceil((hi - lo) / h - 1e-9)) + 1
+    return lo + h * np.arange(n)
+
+def _cell(x, nodes, cubic):
+    # first stencil node i, offset t = u - i in node steps, and stencil width
+    # (linear: 2 nodes, cubic: 4) of x on a uniform axis
+    n = len(nodes)
+    if n == 1:
+        return np.zeros(np.shape(x), dtype=int), np.zeros(np.shape(x)), 1
+    u = (x - nodes[0]) * (1 / (nodes[1] - nodes[0]))
+    width = 4 if cubic and n >= 4 else 2
+    i = np.clip(np.floor(u).astype(np.intp) - (width // 2 - 1), 0, n - width)
+    return i, u - i, width
+
+def _weights(x, nodes, cubic):
+    # node index and Lagrange weights of x on a uniform axis
+    i, t, width = _cell(x, nodes, cubic)
+    if width == 1:
+        return i, np.ones((1,) + np.shape(x))
+    if width == 4:
+        w = [-(t - 1) * (t - 2) * (t - 3) / 6, t * (t - 2) * (t - 3) / 2, -t * (t - 1) * (t - 3) / 2, t * (t - 1) * (t - 2) / 6]
+    else:
+        w = [1 - t, t]
+    return i, np.stack(w)
+
+# power-basis coefficients of the Lagrange polynomial through nodes t = 0..w-1
+_POWER = {w: np.linalg.inv(np.vander(np.arange(w, dtype=float), increasing=True)) for w in (1, 2, 4)}
+
+class GreekGrid:
+    """
+    Cache of Black-Scholes price and Greeks for one contract (K, r, q,
+    option_type) on a uniform lattice in log-spot x sqrt(time-to-expiry) x
+    vol. Queries are answered by vectorized linear or cubic (4-point
+    Lagrange) interpolation instead of calling BSMv at every point.
+
+    The grid is rebuilt lazily, at the same spacing, when a query falls
+    outside it. Points closer to expiry than tau_min are priced exactly,
+    since the Greeks are not smooth there.
+
+    pricer(S, tau, sigma) -> namedtuple or dict of broadcast arrays replaces
+    BSMv.greeks for models without a cheap closed form. For plain
+    Black-Scholes a lookup is slower than calling BSMv directly; the grid
+    is only worth building around a costlier pricer.
+    """
+
+    def __init__(self, K, r, option_type, sigma, T, q=0, spot_range=None, vol_range=None, tau_min=None,
+                 n_spot=256, n_tau=64, n_vol=16, method='cubic', pricer=None):
+        if method not in ('linear', 'cubic'):
+            raise ValueError("method must be 'linear' or 'cubic'")
+        self.K, self.r, self.q, self.option_type, self.method = K, r, q, option_type, method
+        self.pricer = pricer or (lambda S, tau, sigma: BSMv.greeks(S, K, tau, r, sigma, option_type, q))
+        vol_range = (sigma, sigma) if vol_range is None else vol_range
+        if spot_range is None:
+            width = 4 * max(vol_range) * np.sqrt(T)
+            spot_range = (K * np.exp(-width), K * np.exp(width))
+        self.tau_min = T / n_tau if tau_min is None else tau_min
+        x_lo, x_hi = np.log(spot_range[0]), np.log(spot_range[1])
+        u_lo, u_hi = np.sqrt(self.tau_min), np.sqrt(T)
+        self._h = ((x_hi - x_lo) / (n_spot - 1), (u_hi - u_lo) / max(n_tau - 1, 1),
+                   (vol_range[1] - vol_range[0]) / max(n_vol - 1, 1))
+        self.rebuilds = 0
+        self._build((x_lo, u_lo, vol_range[0]), (x_hi, u_hi, vol_range[1]))
+
+    def _build(self, lo, hi):
+        self.axes = [_axis(a, b, h) for a, b, h in zip(lo, hi, self._h)]
+        x, u, vol = self.axes
+        g = self._price(np.exp(x)[:, None, None], u[None, :, None] ** 2, vol[None, None, :])
+        shape = self.shape
+        self.tables = {name: np.broadcast_to(v, shape).ravel() for name, v in g.items()}
+        # flat offsets of the 2x2x2 (linear) and 4x4x4 (cubic) interpolation stencils
+        self._stencils = {}
+        for cubic in (False, True):
+            o = [np.arange(1 if m == 1 else 4 if cubic and m >= 4 else 2) for m in shape]
+            self._stencils[cubic] = (o[0][:, None, None] * shape[1] + o[1][:, None]) * shape[2] + o[2]
+
+    def _price(self, S, tau, sigma):
+        g = self.pricer(S, tau, sigma)
+        return g._asdict() if hasattr(g, '_asdict') else dict(g)
+
+    @property
+    def shape(self):
+        return tuple(len(a) for a in self.axes)
+
+    def _ensure(self, x, u, vol):
+        # widen the grid (keeping its spacing) to cover every query point
+        lo = [a[0] for a in self.axes]
+        hi = [a[-1] for a in self.axes]
+        need_lo = [x.min(), lo[1], vol.min()]
+        need_hi = [x.max(), u.max(initial=lo[1]), vol.max()]
+        if all(nl >= l - 1e-12 for nl, l in zip(need_lo, lo)) and all(nh <= h + 1e-12 for nh, h in zip(need_hi, hi)):
+            return
+        for k in range(3):
+            if self._h[k] == 0:
+                # a single-node axis has no spacing to widen by: move the node
+                if need_lo[k] != need_hi[k]:
+                    name, arg = (('spots', 'spot_range'), ('times to expiry', 'n_tau'), ('vols', 'vol_range'))[k]
+                    raise ValueError(f"queries use several {name} but the grid was built for one; pass {arg}")
+                lo[k] = hi[k] = need_lo[k]
+                continue
+            if need_lo[k] < lo[k] - 1e-12:
+                lo[k] = lo[k] - self._h[k] * np.ceil((lo[k] - need_lo[k]) / self._h[k] + 1)
+            if need_hi[k] > hi[k] + 1e-12:
+                hi[k] = hi[k] + self._h[k] * np.ceil((need_hi[k] - hi[k]) / self._h[k] + 1)
+        self.rebuilds += 1
+        self._build(lo, hi)
+
+    def _interpolate(self, table, stencil, weights):
+        n = self.shape
+        (i, wx), (j, wu), (k, wv) = weights
+        base = (i * n[1] + j) * n[2] + k
+        block = table[base[..., None, None, None] + stencil]
+        return np.einsum('a...,b...,c...,...abc->...', wx, wu, wv, block, optimize=len(stencil) > 2 and base.size > 1000)
+
+    def _line_coefficients(self, table, wu, wv, width):
+        # the table contracted over time and vol at each distinct (tau, sigma)
+        # of a query, as power-basis coefficients of the log-spot interpolant
+        # in every cell: (width, lines * cells), highest power first
+        n = self.shape
+        (j, w_u), (k, w_v) = wu, wv
+        T3 = table.reshape(n)
+        lines = 0.0
+        for b in range(len(w_u)):
+            for c in range(len(w_v)):
+                lines = lines + (w_u[b] * w_v[c]) * T3[:, j + b, k + c]
+        lines = np.broadcast_to(lines, (n[0],) + np.shape(j)).reshape(n[0], -1).T
+        windows = np.lib.stride_tricks.sliding_window_view(lines, width, axis=1)
+        coef = windows @ _POWER[width].T
+        return np.ascontiguousarray(coef[..., ::-1].reshape(-1, width).T)
+
+    def _evaluate_lines(self, coef, line, cell):
+        # Horner evaluation of each point's cell polynomial
+        i, t, width = cell
+        base = line * (self.shape[0] - width + 1) + i
+        out = coef[0][base]
+        for c in coef[1:]:
+            out = out * t + c[base]
+        return out
+
+    def query(self, S, tau, sigma=None, greeks=('price', 'delta'), error=False):
+        """
+        Interpolated values of the named greeks (any of price, delta, gamma,
+        vega, theta, rho, or the pricer's fields) at broadcastable spots S, times to expiry tau and
+        vols sigma (default: the grid's vol).
+
+        When tau and sigma broadcast to far fewer values than the query (e.g.
+        a (paths x steps) spot matrix with one tau per step), the table is
+        first contracted over time and vol once per (tau, sigma) into
+        per-cell polynomial coefficients in log-spot, and each point costs
+        one Horner evaluation; otherwise each point gathers its full 3-D
+        stencil.
+
+        Returns a dict name -> array; with error=True also a dict of error
+        estimates, the gap between the cubic and linear interpolants. It
+        tracks the linear error and is conservative for the cubic one.
+        """
+        unknown = set(greeks) - set(self.tables)
+        if unknown:
+            raise ValueError(f"unknown greeks {sorted(unknown)}; choose from {tuple(self.tables)}")
+        sigma = self.axes[2][0] if sigma is None else sigma
+        S, tau, sigma = (np.asarray(a, dtype=float) for a in (S, tau, sigma))
+        shape = np.broadcast_shapes(S.shape, tau.shape, sigma.shape)
+        x = np.log(S)
+        u = np.sqrt(np.maximum(tau, self.tau_min))
+        self._ensure(x, u, sigma)
+
+        methods = [self.method == 'cubic'] + ([self.method != 'cubic'] if error else [])
+        ts_shape = np.broadcast_shapes(u.shape, sigma.shape)
+        n_lines = int(np.prod(ts_shape))
+        by_line = n_lines * self.shape[0] <= np.prod(shape)
+        if by_line:
+            # the (tau, sigma) pairs are few: contract those axes first
+            line = np.broadcast_to(np.arange(n_lines).reshape(ts_shape), shape)
+            x = np.broadcast_to(x, shape)
+            u_l, v_l = (np.broadcast_to(a, ts_shape).ravel() for a in (u, sigma))
+        else:
+            x, u, sigma_b = np.broadcast_arrays(x, u, sigma)
+        results = []
+        for cubic in methods:
+            out = {}
+            if by_line:
+                cell = _cell(x, self.axes[0], cubic)
+                wu, wv = _weights(u_l, self.axes[1], cubic), _weights(v_l, self.axes[2], cubic)
+                for name in greeks:
+                    out[name] = self._evaluate_lines(self._line_coefficients(self.tables[name], wu, wv, cell[2]), line, cell)
+            else:
+                weights = [_weights(p, a, cubic) for p, a in zip((x, u, sigma_b), self.axes)]
+                for name in greeks:
+                    out[name] = self._interpolate(self.tables[name], self._stencils[cubic], weights)
+            results.append(out)
+        values = results[0]
+        errors = {name: np.abs(values[name] - results[1][name]) for name in greeks} if error else {}
+
+        near = np.broadcast_to(tau < self.tau_min, shape)
+        if near.any():
+            Sb, taub, sigmab = np.broadcast_arrays(S, tau, sigma)
+            exact = self._price(Sb[near], taub[near], sigmab[near])
+            for name in greeks:
+                values[name] = np.array(values[name], dtype=float)
+                values[name][near] = exact[name]
+                if error:
+                    errors[name][near] = 0.0
+        return (values, errors) if error else values
+
+    def __call__(self, S, tau, sigma=None, greek='price'):
+        return self.query(S, tau, sigma, greeks=(greek,))[greek]
@@ -0,0 +1,252 @@
+import numpy as np
+from scipy.special import ndtr
+
+import AssetModels
+import BSMv
+
+def _as_paths(S):
+    S = np.asarray(S, dtype=float)
+    return S[None, :] if S.ndim == 1 else S
+
+def _chunks(n, chunk_size):
+    chunk_size = max(1, int(chunk_size))
+    for lo in range(0, n, chunk_size):
+        yield lo, min(lo + chunk_size, n)
+
+def hedge_deltas(S, K, T, r, sigma_h, option_type, grid=None):
+    """
+    Black-Scholes deltas along a (paths x steps) price matrix on an even grid
+    from 0 to T. At expiry the delta is the payoff indicator (0.5 at the money).
+    grid: optional Grids.GreekGrid for the contract, looked up instead of
+    evaluating the formula before expiry (slower than the formula for plain
+    Black-Scholes; meant for grids built on another pricer).
+    """
+    S = _as_paths(S)
+    tau = T - np.linspace(0, T, S.shape[1])
+    if grid is not None:
+        delta_vals = np.empty_like(S)
+        delta_vals[:, :-1] = grid(S[:, :-1], tau[:-1], sigma_h, greek='delta')
+        at_expiry = np.where(S[:, -1] > K, 1.0, np.where(S[:, -1] < K, 0.0, 0.5))
+        delta_vals[:, -1] = at_expiry if option_type == 'call' else at_expiry - 1
+        return delta_vals
+    d1_vals = np.empty_like(S)
+    with np.errstate(divide='ignore'):
+        d1_vals[:, :-1] = (np.log(S[:, :-1] / K) + (r + 0.5 * sigma_h ** 2) * tau[:-1]) / (sigma_h * np.sqrt(tau[:-1]))
+    d1_vals[:, -1] = np.where(S[:, -1] > K, np.inf, np.where(S[:, -1] < K, -np.inf, 0.0))
+    delta_vals = ndtr(d1_vals)
+    return delta_vals if option_type == 'call' else delta_vals - 1
+
+def _settle(S_T, K, option_type, option_pos):
+    # cash exchanged at expiry when the short option is exercised against the hedge
+    if option_type == 'call':
+        return np.where(S_T > K, -K * option_pos, 0.0)
+    return np.where(S_T < K, K * option_pos, 0.0)
+
+def rebalance(target, every=None, band=None, to_edge=False):
+    """
+    Hedge ratios actually held given (paths x steps) target deltas.
+    every: rebalance only every k-th step (None: every step).
+    band: no-trade half-width around the target, a scalar or a (paths x
+    steps) array; positions inside it are kept, positions outside are moved
+    to the target, or to the nearest band edge with to_edge (Whalley-Wilmott).
+    The last step (expiry) always moves to the target.
+    """
+    target = _as_paths(target)
+    N = target.shape[1]
+    if every is None and band is None:
+        return target
+    steps = np.arange(0, N - 1, 1 if every is None else int(every))
+    if band is None:
+        held = target[:, np.repeat(steps, np.diff(np.append(steps, N - 1)))]
+        return np.concatenate([held, target[:, -1:]], axis=1)
+    band = np.broadcast_to(band, target.shape)
+    held = np.empty_like(target)
+    h = np.zeros(target.shape[0])
+    prev = 0
+    for j in steps:
+        held[:, prev:j] = h[:, None]
+        gap = target[:, j] - h
+        move = target[:, j] - np.sign(gap) * band[:, j] if to_edge else target[:, j]
+        h = np.where(np.abs(gap) > band[:, j], move, h)
+        prev = j
+    held[:, prev:N - 1] = h[:, None]
+    held[:, -1] = target[:, -1]
+    return held
+
+def delta_hedge_paths(S, K, T, r, sigma, option_type, option_pos, sigma_h=None, chunk_size=10_000, return_paths=False, grid=None,
+                      cost=0.0, fixed_cost=0.0, every=None, band=None, ww_risk_aversion=None):
+    """
+    Delta-hedge PnL for every row of a (paths x steps) price matrix at once.
+    Same conventions as BSMv.delta_hedge: rebalancing at every step, hedge
+    cash flows accrued at r to T, settlement at expiry, discounted to 0,
+    less the premium priced at sigma from each path's first price.
+    Paths are processed in chunks of chunk_size rows to bound memory.
+    grid: optional Grids.GreekGrid supplying the hedge deltas.
+
+    Transaction costs: cost is proportional to the traded value, fixed_cost
+    is charged per rebalance (initial trade and expiry adjustment included),
+    both paid from the hedge cash and accrued like it. Rebalancing schedule (see
+    rebalance): every k steps, a delta band of half-width band, or the
+    Whalley-Wilmott band for the given ww_risk_aversion, whose half-width
+    (3/2 exp(-r tau) cost S gamma^2 / risk_aversion)^(1/3) is traded to
+    its edge.
+
+    Returns the PnL per path, plus the (paths x steps) cumulative PnL matrix
+    (the dh_path of every path) when return_paths is True.
+    """
+    if option_type not in ('call', 'put'):
+        raise ValueError("option_type must be 'call' or 'put'")
+    sigma_h = sigma if sigma_h is None else sigma_h
+    S = _as_paths(S)
+    n, N = S.shape
+    tau = T - np.linspace(0, T, N)
+    growth = np.exp(r * tau)
+    disc = np.exp(-r * T)
+    premium = BSMv.price(S[:, 0], K, T, r, sigma, option_type) * option_pos
+
+    pnl = np.empty(n)
+    dh = np.empty((n, N)) if return_paths else None
+    for lo, hi in _chunks(n, chunk_size):
+        s = S[lo:hi]
+        delta_vals = hedge_deltas(s, K, T, r, sigma_h, option_type, grid=grid)
+        if ww_risk_aversion is not None:
+            width = np.zeros_like(s)
+            gamma_vals = _bs_terms(s[:, :-1], K, tau[:-1], r, sigma_h, option_type)[2]
+            width[:, :-1] = np.cbrt(1.5 * np.exp(-r * tau[:-1]) * cost * s[:, :-1] * gamma_vals ** 2 / ww_risk_aversion)
+            delta_vals = rebalance(delta_vals, every=every, band=width, to_edge=True)
+        else:
+            delta_vals = rebalance(delta_vals, every=every, band=band)
+        trades = np.diff(delta_vals, axis=1, prepend=0) * option_pos
+        cashflows = trades * s * growth
+        if cost or fixed_cost:
+            cashflows = cashflows - (cost * np.abs(trades) * s + fixed_cost * (trades != 0)) * growth
+        settle = _settle(s[:, -1], K, option_type, option_pos)
+        if return_paths:
+            path = np.cumsum(cashflows, axis=1)
+            path[:, -1] += settle
+            dh[lo:hi] = path * disc - premium[lo:hi, None]
+            pnl[lo:hi] = dh[lo:hi, -1]
+        else:
+            pnl[lo:hi] = (cashflows.sum(axis=1) + settle) * disc - premium[lo:hi]
+    return (pnl, dh) if return_paths else pnl
+
+def _bs_terms(S, K, tau, r, sigma, option_type):
+    # Black-Scholes price, delta and gamma of a (paths x steps) matrix, tau > 0
+    sqrt_tau = np.sqrt(tau)
+    d1_vals = (np.log(S / K) + (r + 0.5 * sigma ** 2) * tau) / (sigma * sqrt_tau)
+    d2_vals = d1_vals - sigma * sqrt_tau
+    N1 = ndtr(d1_vals)
+    disc_K = K * np.exp(-r * tau)
+    value = S * N1 - disc_K * ndtr(d2_vals)
+    if option_type == 'put':
+        value = value - S + disc_K
+        N1 = N1 - 1
+    gamma_vals = np.exp(-0.5 * d1_vals ** 2) / (np.sqrt(2 * np.pi) * S * sigma * sqrt_tau)
+    return value, N1, gamma_vals
+
+def gamma_hedge_paths(S, K, T, r, sigma, option_type, option_pos, hedge_K=None, hedge_T=None, hedge_type='call', sigma_h=None, chunk_size=10_000, return_paths=False):
+    """
+    Delta-gamma hedge PnL for every row of a (paths x steps) price matrix,
+    with the conventions of delta_hedge_paths. At each step the position
+    holds option_pos * gamma / gamma_h units of the hedge option (strike
+    hedge_K, default each path's first price; expiry hedge_T >= T, default
+    T; type hedge_type) and enough stock to make the book delta neutral.
+    Hedge options are traded at their Black-Scholes value at sigma_h and
+    sold back at T; the stock leg settles as in delta_hedge_paths.
+
+    Returns the PnL per path, plus the (paths x steps) cumulative PnL matrix
+    when return_paths is True.
+    """
+    if option_type not in ('call', 'put') or hedge_type not in ('call', 'put'):
+        raise ValueError("option_type must be 'call' or 'put'")
+    sigma_h = sigma if sigma_h is None else sigma_h
+    hedge_T = T if hedge_T is None else hedge_T
+    if hedge_T < T:
+        raise ValueError("hedge_T must not be before T")
+    S = _as_paths(S)
+    n, N = S.shape
+    t = np.linspace(0, T, N)
+    tau = T - t
+    growth = np.exp(r * tau)
+    disc = np.exp(-r * T)
+    hedge_K = S[:, 0] if hedge_K is None else np.broadcast_to(np.asarray(hedge_K, dtype=float), (n,))
+    premium = BSMv.price(S[:, 0], K, T, r, sigma, option_type) * option_pos
+
+    pnl = np.empty(n)
+    dh = np.empty((n, N)) if return_paths else None
+    for lo, hi in _chunks(n, chunk_size):
+        s = S[lo:hi, :-1]
+        k_h = hedge_K[lo:hi, None]
+        _, delta_vals, gamma_vals = _bs_terms(s, K, tau[:-1], r, sigma_h, option_type)
+        value_h, delta_h, gamma_h = _bs_terms(s, k_h, hedge_T - t[:-1], r, sigma_h, hedge_type)
+        units = np.zeros((hi - lo, N))
+        np.divide(gamma_vals * option_pos, gamma_h, out=units[:, :-1], where=gamma_h > 1e-12)
+
+        stock = np.empty((hi - lo, N))
+        stock[:, :-1] = delta_vals * option_pos - units[:, :-1] * delta_h
+        stock[:, -1] = hedge_deltas(S[lo:hi, -1:], K, 0.0, r, sigma_h, option_type)[:, 0] * option_pos
+        # hedge options are sold back at T: payoff if they expire then, else their value
+        S_T = S[lo:hi, -1:]
+        if hedge_T > T:
+            value_T = _bs_terms(S_T, k_h, hedge_T - T, r, sigma_h, hedge_type)[0]
+        else:
+            value_T = np.maximum(S_T - k_h, 0) if hedge_type == 'call' else np.maximum(k_h - S_T, 0)
+        value_h = np.concatenate([value_h, value_T], axis=1)
+
+        cashflows = (np.diff(stock, axis=1, prepend=0) * S[lo:hi] + np.diff(units, axis=1, prepend=0) * value_h) * growth
+        settle = _settle(S[lo:hi, -1], K, option_type, option_pos)
+        if return_paths:
+            path = np.cumsum(cashflows, axis=1)
+            path[:, -1] += settle
+            dh[lo:hi] = path * disc - premium[lo:hi, None]
+            pnl[lo:hi] = dh[lo:hi, -1]
+        else:
+            pnl[lo:hi] = (cashflows.sum(axis=1) + settle) * disc - premium[lo:hi]
+    return (pnl, dh) if return_paths else pnl
+
+def _simulate(engine, S0, mu, sigma_a, T, dt, nsim, rng, shocks, chunk_size, return_paths, simulator=None):
+    # generate paths (GBM unless simulator is given) chunk by chunk and run engine(S) on each chunk
+    rng = AssetModels.make_rng(rng)
+    if shocks == "sobol":
+        # quasi-random points must come from one sequence
+        chunk_size = nsim
+    pnl = np.empty(nsim)
+    dh = None
+    for lo, hi in _chunks(nsim, chunk_size):
+        if simulator is None:
+            S = AssetModels.GBM(S0, mu, sigma_a, T, dt, n_paths=hi - lo, rng=rng, shocks=shocks)
+        else:
+            S = simulator(hi - lo, rng, shocks)
+        out = engine(S, chunk_size)
+        if return_paths:
+            if dh is None:
+                dh = np.empty((nsim, S.shape[1]))
+            pnl[lo:hi], dh[lo:hi] = out
+        else:
+            pnl[lo:hi] = out
+    return (pnl, dh) if return_paths else pnl
+
+def MC_delta_hedge(S0, K, T, r, sigma, option_type, mu, dt, option_pos, nsim=1000, sigma_h=None, sigma_a=None, rng=None, shocks="normal", chunk_size=10_000, return_paths=False, simulator=None, **hedge_kwargs):
+    """
+    Simulate nsim GBM paths (drift mu, vol sigma_a) and delta-hedge them all.
+    Paths are generated chunk by chunk, so memory is bounded by chunk_size
+    unless return_paths asks for the full dh_path matrix. hedge_kwargs
+    (costs, rebalancing schedule) are passed to delta_hedge_paths.
+    simulator(n, rng, shocks) -> (n, N + 1) prices replaces GBM, e.g.
+    lambda n, rng, shocks: VolModels.Heston(..., n_paths=n, rng=rng, shocks=shocks)[0].
+    """
+    sigma_a = sigma if sigma_a is None else sigma_a
+    def engine(S, size):
+        return delta_hedge_paths(S, K, T, r, sigma, option_type, option_pos, sigma_h=sigma_h, chunk_size=size, return_paths=return_paths, **hedge_kwargs)
+    return _simulate(engine, S0, mu, sigma_a, T, dt, nsim, rng, shocks, chunk_size, return_paths, simulator)
+
+def MC_gamma_hedge(S0, K, T, r, sigma, option_type, mu, dt, option_pos, nsim=1000, hedge_K=None, hedge_T=None, hedge_type='call', sigma_h=None, sigma_a=None, rng=None, shocks="normal", chunk_size=10_000, return_paths=False, simulator=None):
+    """
+    Simulate nsim GBM paths (drift mu, vol sigma_a) and delta-gamma hedge
+    them all with gamma_hedge_paths, chunk by chunk as in MC_delta_hedge
+    (including its simulator option).
+    """
+    sigma_a = sigma if sigma_a is None else sigma_a
+    def engine(S, size):
+        return gamma_hedge_paths(S, K, T, r, sigma, option_type, option_pos, hedge_K=hedge_K, hedge_T=hedge_T, hedge_type=hedge_type, sigma_h=sigma_h, chunk_size=size, return_paths=return_paths)
+    return _simulate(engine, S0, mu, sigma_a, T, dt, nsim, rng, shocks, chunk_size, return_paths, simulator)
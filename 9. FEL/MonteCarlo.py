@@ -0,0 +1,163 @@
+from collections import namedtuple
+
+import numpy as np
+from scipy.special import ndtri
+
+import AssetModels
+import BSMv
+import Hedging
+
+MCResult = namedtuple("MCResult", ["mean", "se", "halfwidth", "n", "converged", "beta"])
+
+def adaptive_mc(sampler, control_means=None, target_se=None, target_halfwidth=None, confidence=0.95, batch_size=10_000, max_paths=1_000_000, min_batches=None, by_batch=False, rng=None):
+    """
+    Run sampler in batches until the standard error (or the confidence
+    half-width) of the mean drops below target, or max_paths is reached.
+
+    sampler(n, rng) returns either values (n,) or (values, controls) with
+    controls (n, k) whose expectations are control_means (k,). With controls,
+    the estimate is the control-variate mean y - beta (c - E[c]), beta being
+    the pooled regression coefficient of y on c.
+
+    by_batch: estimate the error from the spread of batch means instead of
+    the path-level variance. Use it when paths within a batch are not
+    independent (antithetic, moment-matched or Sobol shocks).
+    min_batches: batches to run before testing the target (default 2, or 8
+    with by_batch so the batch-mean spread is meaningful).
+
+    Returns MCResult(mean, se, halfwidth, n, converged, beta).
+    """
+    if target_se is None and target_halfwidth is None:
+        raise ValueError("Provide target_se or target_halfwidth")
+    z = ndtri(0.5 + confidence / 2)
+    target = target_se if target_se is not None else target_halfwidth / z
+    if min_batches is None:
+        min_batches = 8 if by_batch else 2
+    rng = AssetModels.make_rng(rng)
+    mu_c = None if control_means is None else np.atleast_1d(np.asarray(control_means, dtype=float))
+
+    n = 0
+    mean = None
+    M2 = None
+    batch_means = []
+    converged = False
+    while n < max_paths:
+        size = min(batch_size, max_paths - n)
+        out = sampler(size, rng)
+        if isinstance(out, tuple):
+            y, c = out
+            Z = np.column_stack([np.asarray(y, dtype=float), np.asarray(c, dtype=float).reshape(len(y), -1)])
+        else:
+            Z = np.asarray(out, dtype=float)[:, None]
+        nb = len(Z)
+        mb = Z.mean(axis=0)
+        Db = Z - mb
+        M2b = Db.T @ Db
+        # merge batch moments into the running ones (Chan et al.)
+        if mean is None:
+            mean, M2 = mb, M2b
+        else:
+            delta = mb - mean
+            M2 = M2 + M2b + np.outer(delta, delta) * n * nb / (n + nb)
+            mean = mean + delta * nb / (n + nb)
+        n += nb
+        batch_means.append(mb)
+
+        est, se, beta = _estimate(mean, M2, n, mu_c, batch_means if by_batch else None)
+        if len(batch_means) >= min_batches and se <= target:
+            converged = True
+            break
+
+    return MCResult(est, se, z * se, n, converged, beta)
+
+def _estimate(mean, M2, n, mu_c, batch_means):
+    k = len(mean) - 1
+    beta = None
+    if mu_c is not None and k > 0:
+        Scc = M2[1:, 1:]
+        Scy = M2[1:, 0]
+        beta = np.linalg.lstsq(Scc, Scy, rcond=None)[0]
+    if batch_means is not None:
+        B = np.asarray(batch_means)
+        est_b = B[:, 0] if beta is None else B[:, 0] - (B[:, 1:] - mu_c) @ beta
+        if len(est_b) < 2:
+            return est_b.mean(), np.inf, beta
+        return est_b.mean(), est_b.std(ddof=1) / np.sqrt(len(est_b)), beta
+    if beta is None:
+        var = M2[0, 0] / max(n - 1, 1)
+        return mean[0], np.sqrt(var / n), None
+    est = mean[0] - (mean[1:] - mu_c) @ beta
+    resid = M2[0, 0] - beta @ M2[1:, 0]
+    var = max(resid, 0.0) / max(n - k - 1, 1)
+    return est, np.sqrt(var / n), beta
+
+def _controls(S_T, K, T, r, drift, sigma_a, S0, option_type, controls):
+    # discounted terminal price and/or discounted payoff, with their means
+    # under a GBM with the given drift
+    cols, means = [], []
+    disc = np.exp(-r * T)
+    for name in controls:
+        if name == "terminal":
+            cols.append(disc * S_T)
+            means.append(S0 * np.exp((drift - r) * T))
+        elif name == "payoff":
+            payoff = np.maximum(S_T - K, 0) if option_type == 'call' else np.maximum(K - S_T, 0)
+            cols.append(disc * payoff)
+            means.append(np.exp((drift - r) * T) * BSMv.price(S0, K, T, drift, sigma_a, option_type))
+        else:
+            raise ValueError("controls must be 'terminal' and/or 'payoff'")
+    return np.column_stack(cols), np.array(means)
+
+def hedge_pnl_sampler(S0, K, T, r, sigma, option_type, mu, dt, option_pos, sigma_h=None, sigma_a=None, shocks="normal", controls=("terminal",), hedge="delta", **hedge_kwargs):
+    """
+    Sampler of hedge PnL on GBM paths for adaptive_mc: hedge="delta" runs
+    Hedging.delta_hedge_paths, hedge="gamma" Hedging.gamma_hedge_paths with
+    hedge_kwargs (hedge_K, hedge_T, hedge_type). controls: any of "terminal"
+    (discounted S_T) and "payoff" (discounted option payoff, whose mean is a
+    Black-Scholes price).
+
+    Returns (sampler, control_means).
+    """
+    engines = {"delta": Hedging.delta_hedge_paths, "gamma": Hedging.gamma_hedge_paths}
+    if hedge not in engines:
+        raise ValueError("hedge must be 'delta' or 'gamma'")
+    engine = engines[hedge]
+    sigma_a = sigma if sigma_a is None else sigma_a
+    control_means = _controls(np.array([S0]), K, T, r, mu, sigma_a, S0, option_type, controls)[1] if controls else None
+
+    def sampler(n, rng):
+        S = AssetModels.GBM(S0, mu, sigma_a, T, dt, n_paths=n, rng=rng, shocks=shocks)
+        pnl = engine(S, K, T, r, sigma, option_type, option_pos, sigma_h=sigma_h, **hedge_kwargs)
+        if not controls:
+            return pnl
+        return pnl, _controls(S[:, -1], K, T, r, mu, sigma_a, S0, option_type, controls)[0]
+
+    return sampler, control_means
+
+def payoff_sampler(payoff, S0, T, r, sigma, dt, K=None, option_type='call', shocks="normal", controls=("terminal",)):
+    """
+    Risk-neutral sampler of the discounted payoff(S_paths) of a (possibly
+    path-dependent) option on GBM paths, for adaptive_mc. The "payoff"
+    control is the European option with strike K, priced by Black-Scholes.
+
+    Returns (sampler, control_means).
+    """
+    control_means = _controls(np.array([S0]), K, T, r, r, sigma, S0, option_type, controls)[1] if controls else None
+
+    def sampler(n, rng):
+        S = AssetModels.GBM(S0, r, sigma, T, dt, n_paths=n, rng=rng, shocks=shocks)
+        values = np.exp(-r * T) * np.asarray(payoff(S), dtype=float)
+        if not controls:
+            return values
+        return values, _controls(S[:, -1], K, T, r, r, sigma, S0, option_type, controls)[0]
+
+    return sampler, control_means
+
+def MC_pnl_adaptive(S0, K, T, r, sigma, option_type, mu, dt, option_pos, target_se=None, target_halfwidth=None, confidence=0.95, sigma_h=None, sigma_a=None, controls=("terminal",), shocks="normal", batch_size=10_000, max_paths=1_000_000, rng=None, hedge="delta", **hedge_kwargs):
+    """
+    Adaptive counterpart of BSM.MC_pnl: mean hedge PnL (hedge="delta" or
+    "gamma", see hedge_pnl_sampler) to a target precision, with its
+    standard error.
+    """
+    sampler, control_means = hedge_pnl_sampler(S0, K, T, r, sigma, option_type, mu, dt, option_pos, sigma_h=sigma_h, sigma_a=sigma_a, shocks=shocks, controls=controls, hedge=hedge, **hedge_kwargs)
+    return adaptive_mc(sampler, control_means=control_means, target_se=target_se, target_halfwidth=target_halfwidth, confidence=confidence, batch_size=batch_size, max_paths=max_paths, by_batch=shocks != "normal", rng=rng)
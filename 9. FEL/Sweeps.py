@@ -0,0 +1,137 @@
+import inspect
+import itertools
+import os
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from multiprocessing import shared_memory
+
+import numpy as np
+import pandas as pd
+
+import AssetModels
+import Hedging
+
+# Parameters that shape the simulated paths; every other swept parameter only
+# changes how the same paths are hedged.
+PATH_PARAMS = ("S0", "T", "mu", "sigma_a", "dt")
+HEDGE_PARAMS = ("K", "r", "sigma", "sigma_h", "option_type", "option_pos", "hedge_K", "hedge_T", "hedge_type",
+                "cost", "fixed_cost", "every", "band", "ww_risk_aversion")
+# engine keywords left at their defaults unless swept
+OPTIONAL_PARAMS = ("hedge_K", "hedge_T", "hedge_type", "cost", "fixed_cost", "every", "band", "ww_risk_aversion")
+ENGINES = {"delta": Hedging.delta_hedge_paths, "gamma": Hedging.gamma_hedge_paths}
+
+def expand_grid(grid, **base):
+    """
+    Cartesian product of grid (name -> list of values) over the base
+    parameters, as a DataFrame with one row per point. sigma_h and sigma_a
+    default to sigma.
+    """
+    unknown = set(grid) - set(PATH_PARAMS) - set(HEDGE_PARAMS)
+    if unknown:
+        raise ValueError(f"cannot sweep {sorted(unknown)}; choose from {PATH_PARAMS + HEDGE_PARAMS}")
+    names = list(grid)
+    rows = [{**base, **dict(zip(names, values))} for values in itertools.product(*(grid[n] for n in names))]
+    points = pd.DataFrame(rows)
+    for name in ("sigma_h", "sigma_a"):
+        if name not in points or points[name].isna().any():
+            points[name] = points[name].fillna(points["sigma"]) if name in points else points["sigma"]
+    return points
+
+def _check_engine(grid, hedge):
+    # hedging parameters the engine does not take would only fail in a worker
+    accepted = inspect.signature(ENGINES[hedge]).parameters
+    rejected = sorted(name for name in grid if name in HEDGE_PARAMS and name not in accepted)
+    if rejected:
+        raise ValueError(f"hedge={hedge!r} does not take {rejected}; sweep them with another engine")
+
+def _point_key(row, columns):
+    # missing values (None, or NaN after a checkpoint round trip) compare
+    # equal as None; NaN itself never matches another NaN
+    return tuple(None if pd.isna(row[c]) else row[c] for c in columns)
+
+def _run_point(shm_name, shape, params, hedge):
+    # worker: hedge the shared paths with one set of parameters
+    shm = shared_memory.SharedMemory(name=shm_name)
+    try:
+        S = np.ndarray(shape, dtype=np.float64, buffer=shm.buf)
+        p = dict(params)
+        pnl = ENGINES[hedge](S, p.pop("K"), p.pop("T"), p.pop("r"), p.pop("sigma"), p.pop("option_type"), p.pop("option_pos"), **p)
+    finally:
+        shm.close()
+    n = len(pnl)
+    std = pnl.std(ddof=1)
+    return {"mean": pnl.mean(), "se": std / np.sqrt(n), "std": std, "n_paths": n}
+
+def run_sweep(grid, S0=100, T=1, r=0.0, mu=0.0, sigma=0.2, K=100, option_type='call', dt=1/252, option_pos=1, sigma_h=None, sigma_a=None,
+              nsim=10_000, hedge="delta", n_workers=None, checkpoint=None, seed=0, shocks="normal"):
+    """
+    Hedge-PnL sweep over a parameter grid (name -> list of values; any of
+    PATH_PARAMS and HEDGE_PARAMS, the rest fixed by the keyword arguments).
+
+    Paths are simulated once per group of PATH_PARAMS values, placed in
+    shared memory and hedged by a process pool (n_workers processes, default
+    os.cpu_count(); 0 runs in this process) for every hedging parameter set
+    in the group, so points within a group use common random numbers. Each
+    group's paths are seeded from (seed, group number), so results do not
+    depend on the number of workers.
+
+    checkpoint: CSV path. Finished points are appended as they complete and
+    points already in the file are skipped, so an interrupted sweep resumes.
+
+    Returns a DataFrame with the parameters of every point and the mean,
+    standard error and standard deviation of the PnL.
+    """
+    if hedge not in ENGINES:
+        raise ValueError("hedge must be 'delta' or 'gamma'")
+    _check_engine(grid, hedge)
+    base = dict(S0=S0, T=T, r=r, mu=mu, sigma=sigma, K=K, option_type=option_type, dt=dt, option_pos=option_pos, sigma_h=sigma_h, sigma_a=sigma_a)
+    points = expand_grid(grid, **base)
+    param_cols = list(points.columns)
+
+    done = pd.DataFrame()
+    if checkpoint is not None and os.path.exists(checkpoint):
+        done = pd.read_csv(checkpoint, float_precision="round_trip")
+    finished = {_point_key(row, param_cols) for _, row in done.iterrows()} if len(done) else set()
+
+    hedge_cols = [c for c in param_cols if c not in PATH_PARAMS or c == "T"]
+    results = []
+    n_workers = os.cpu_count() if n_workers is None else n_workers
+    pool = ProcessPoolExecutor(max_workers=n_workers) if n_workers > 0 else None
+    try:
+        for group, (path_values, members) in enumerate(points.groupby(list(PATH_PARAMS), sort=False)):
+            todo = [row for _, row in members.iterrows() if _point_key(row, param_cols) not in finished]
+            if not todo:
+                continue
+            p = dict(zip(PATH_PARAMS, path_values))
+            rng = np.random.default_rng([seed, group])
+            S = AssetModels.GBM(p["S0"], p["mu"], p["sigma_a"], p["T"], p["dt"], n_paths=nsim, rng=rng, shocks=shocks)
+            shm = shared_memory.SharedMemory(create=True, size=S.nbytes)
+            try:
+                np.ndarray(S.shape, dtype=np.float64, buffer=shm.buf)[:] = S
+                tasks = []
+                for row in todo:
+                    params = {c: row[c] for c in hedge_cols if not (c in OPTIONAL_PARAMS and pd.isna(row[c]))}
+                    tasks.append((row, (shm.name, S.shape, params, hedge)))
+                if pool is None:
+                    outputs = ((row, _run_point(*args)) for row, args in tasks)
+                else:
+                    futures = {pool.submit(_run_point, *args): row for row, args in tasks}
+                    outputs = ((futures[f], f.result()) for f in as_completed(futures))
+                for row, out in outputs:
+                    record = {**{c: row[c] for c in param_cols}, **out}
+                    results.append(record)
+                    if checkpoint is not None:
+                        pd.DataFrame([record]).to_csv(checkpoint, mode="a", index=False, header=not os.path.exists(checkpoint))
+            finally:
+                shm.close()
+                shm.unlink()
+    finally:
+        if pool is not None:
+            pool.shutdown()
+
+    out = pd.concat([done, pd.DataFrame(results)], ignore_index=True) if len(done) else pd.DataFrame(results)
+    if out.empty:
+        return out
+    # keep only the points of this grid, in grid order
+    order = {_point_key(row, param_cols): i for i, (_, row) in enumerate(points.iterrows())}
+    out["_order"] = [order.get(_point_key(row, param_cols)) for _, row in out.iterrows()]
+    return out.dropna(subset=["_order"]).sort_values("_order").drop(columns="_order").reset_index(drop=True)
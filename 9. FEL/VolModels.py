@@ -1,3 +1,5 @@
+from collections import namedtuple
+
 import numpy as np
 
 def GARCH_model(data):
@@ -17,8 +19,330 @@ def GARCH_model(data):
     
     return garch_model
 
+def _returns(data, prices=False, ascending=False):
+    # oldest observation first; prices become log returns
+    x = np.asarray(data, dtype=np.float64)
+    if not ascending:
+        x = x[::-1]
+    return np.diff(np.log(x), axis=0) if prices else x
+
 def GARCH_forecast(data, prices = False, ascending = False, steps = 1):
-    
-    garch_model = GARCH_model(data, prices, ascending)
-    forecast = garch_model.forecast(horizon=steps)
-    return forecast.variance[-1:]
\ No newline at end of file
+    """
+    Variance forecasts h.1 ... h.steps of an AR(1)-GARCH(1,1) fitted to
+    data: returns, or prices with prices=True (log returns are used),
+    newest first unless ascending=True. Fitted with GARCH_fit. As with
+    arch's forecast.variance[-1:], one series gives a single row indexed by
+    its latest date (position for arrays); a (T x series) panel gives one
+    row per series.
+    """
+    import pandas as pd
+    r = _returns(data, prices, ascending)
+    fit = GARCH_fit(r)
+    h = GARCH_variance_forecast(fit.params, fit.h_next, steps)
+    if isinstance(data, pd.DataFrame):
+        index = data.columns
+    elif isinstance(data, pd.Series):
+        index = data.index[[-1 if ascending else 0]]
+    else:
+        index = [len(r) - 1]
+    return pd.DataFrame(np.atleast_2d(h), index=index, columns=[f"h.{k}" for k in range(1, steps + 1)])
+
+# Native AR(1)-GARCH(1,1): r[t] = mu + phi r[t-1] + e[t], e[t] = sqrt(h[t]) z[t],
+# h[t] = omega + alpha e[t-1]^2 + beta h[t-1], the model GARCH_model fits with
+# arch. Returns are a (T x series) array (or a 1-D series); every function
+# runs the recursion over time once, vectorized across series. The first
+# variance uses arch's backcast (exponentially weighted mean of the first
+# squared residuals), computed from the residuals at the starting values and
+# then held fixed while fitting, as arch does. params are (series, 5) in the
+# order of GARCH_PARAMS.
+
+GARCH_PARAMS = ("mu", "phi", "omega", "alpha", "beta")
+GARCHFit = namedtuple("GARCHFit", ["params", "se", "loglik", "h_next", "converged"])
+
+def _backcast(e):
+    tau = min(75, len(e))
+    w = 0.94 ** np.arange(tau)
+    return (w / w.sum()) @ e[:tau] ** 2
+
+def _garch_pass(R, params, backcast=None, scores=False):
+    mu, phi, omega, alpha, beta = params.T
+    x, y = R[:-1], R[1:]
+    e = y - mu - phi * x
+    backcast = _backcast(e) if backcast is None else backcast
+    e2_prev = np.concatenate([backcast[None], e[:-1] ** 2])
+    c = omega + alpha * e2_prev
+    h = np.empty_like(e)
+    h_prev = e2_prev[0]
+    for t in range(len(e)):
+        h_prev = h[t] = c[t] + beta * h_prev
+    loglik = -0.5 * (np.log(2 * np.pi) + np.log(h) + e ** 2 / h).sum(axis=0)
+    h_next = omega + alpha * e[-1] ** 2 + beta * h[-1]
+    if not scores:
+        return loglik, h_next, e, h
+    # per-date scores
+    D = np.empty(e.shape + (5,))
+    D[1:, :, 0] = -2 * alpha * e[:-1]
+    D[1:, :, 1] = -2 * alpha * e[:-1] * x[:-1]
+    D[0, :, :2] = 0
+    D[..., 2] = 1
+    D[..., 3] = e2_prev
+    D[0, :, 4] = e2_prev[0]
+    D[1:, :, 4] = h[:-1]
+    dh = np.empty_like(D)
+    dh_prev = np.zeros(D.shape[1:])
+    for t in range(len(e)):
+        dh_prev = dh[t] = D[t] + beta[:, None] * dh_prev
+    G = -0.5 * (1 / h - e ** 2 / h ** 2)[..., None] * dh
+    G[..., 0] += e / h
+    G[..., 1] += e * x / h
+    return loglik, h_next, e, h, G
+
+def _feasible(params):
+    omega, alpha, beta = params[:, 2], params[:, 3], params[:, 4]
+    return (omega > 0) & (alpha >= 0) & (beta >= 0) & (alpha + beta < 1)
+
+def _solvable(B):
+    # finite and numerically nonsingular BHHH matrices
+    ok = np.isfinite(B).all(axis=(1, 2))
+    w = np.linalg.eigvalsh(np.where(ok[:, None, None], B, np.eye(B.shape[-1])))
+    return ok & (w[:, 0] > 1e-12 * w[:, -1])
+
+def GARCH_filter(returns, params):
+    """
+    Conditional variances h (T - 1, series) and residuals e of returns
+    (dates 1..T-1; date 0 is the first lag) under given params, with the
+    log-likelihood and next-date variance of every series.
+
+    Returns (h, e, loglik, h_next).
+    """
+    R = np.asarray(returns, dtype=np.float64)
+    single = R.ndim == 1
+    R = R[:, None] if single else R
+    params = np.atleast_2d(np.asarray(params, dtype=np.float64))
+    loglik, h_next, e, h = _garch_pass(R, params)
+    if single:
+        return h[:, 0], e[:, 0], loglik[0], h_next[0]
+    return h, e, loglik, h_next
+
+def GARCH_fit(returns, start=None, tol=1e-5, max_iter=200):
+    """
+    Maximum-likelihood AR(1)-GARCH(1,1) fits of every column of returns
+    (T x series) at once. BHHH steps, solved as one batch of 5 x 5 systems,
+    with step halving that keeps omega > 0, alpha, beta >= 0 and
+    alpha + beta < 1; a series stops once its Newton decrement falls below
+    tol. Each series is scaled to unit variance internally.
+
+    start: (series, 5) parameters to warm-start from, e.g. the previous
+    window's fit; rows with NaN (and start=None) use OLS AR(1) estimates
+    with alpha = 0.05, beta = 0.9. Series with missing values, a constant
+    lag or an exact AR(1) fit are not fitted (NaN), nor are series whose
+    BHHH system becomes non-finite or singular; the rest of the batch is
+    unaffected.
+
+    Returns GARCHFit(params, se, loglik, h_next, converged): se from the
+    outer product of the scores, h_next the variance of the next date.
+    """
+    R = np.asarray(returns, dtype=np.float64)
+    single = R.ndim == 1
+    R = R[:, None] if single else R
+    T, n = R.shape
+    params = np.full((n, 5), np.nan)
+    se = np.full((n, 5), np.nan)
+    loglik = np.full(n, np.nan)
+    h_next = np.full(n, np.nan)
+    converged = np.zeros(n, dtype=bool)
+
+    # a constant lag leaves the AR(1) start undefined
+    cols = np.flatnonzero(np.isfinite(R).all(axis=0) & (R[:-1].std(axis=0) > 0))
+    scale = R[:, cols].std(axis=0)
+    Z = R[:, cols] / scale
+    x, y = Z[:-1], Z[1:]
+    xm, ym = x.mean(axis=0), y.mean(axis=0)
+    phi0 = ((x - xm) * (y - ym)).sum(axis=0) / ((x - xm) ** 2).sum(axis=0)
+    mu0 = ym - phi0 * xm
+    e0 = y - mu0 - phi0 * x
+    var0 = e0.var(axis=0)
+    p = np.column_stack([mu0, phi0, 0.05 * var0, np.full_like(mu0, 0.05), np.full_like(mu0, 0.9)])
+    # series fitted exactly by the AR(1) have no variance left to model
+    keep = np.isfinite(p).all(axis=1) & (var0 > 0)
+    cols, scale, Z, x, y, e0, p = cols[keep], scale[keep], Z[:, keep], x[:, keep], y[:, keep], e0[:, keep], p[keep]
+    if len(cols):
+        to_unit = np.column_stack([1 / scale, np.ones_like(scale), 1 / scale ** 2, np.ones_like(scale), np.ones_like(scale)])
+        if start is not None:
+            warm = np.atleast_2d(np.asarray(start, dtype=np.float64))[cols] * to_unit
+            ok = np.isfinite(warm).all(axis=1) & _feasible(warm)
+            p[ok] = warm[ok]
+            e0[:, ok] = y[:, ok] - p[ok, 0] - p[ok, 1] * x[:, ok]
+        bc = _backcast(e0)
+
+        done = np.zeros(len(cols), dtype=bool)
+        failed = np.zeros(len(cols), dtype=bool)
+        ll = B = None
+        for _ in range(max_iter):
+            act = np.flatnonzero(~done)
+            if not len(act):
+                break
+            ll_a, _, _, _, G = _garch_pass(Z[:, act], p[act], bc[act], scores=True)
+            g = G.sum(axis=0)
+            B_a = np.einsum('tni,tnj->nij', G, G)
+            # a series with a non-finite or singular system drops out alone
+            bad = ~(_solvable(B_a) & np.isfinite(g).all(axis=1) & np.isfinite(ll_a))
+            B_a[bad], g[bad] = np.eye(5), 0
+            step = np.linalg.solve(B_a, g[..., None])[..., 0]
+            decrement = (g * step).sum(axis=1)
+            stop = (decrement < tol) & ~bad
+            # step halving until feasible and not worse, all series at once
+            lam = np.ones(len(act))
+            moving = ~stop & ~bad
+            for _ in range(10):
+                if not moving.any():
+                    break
+                idx = np.flatnonzero(moving)
+                cand = p[act[idx]] + lam[idx, None] * step[idx]
+                good = _feasible(cand)
+                if good.any():
+                    ll_c = np.full(len(idx), -np.inf)
+                    ll_c[good] = _garch_pass(Z[:, act[idx[good]]], cand[good], bc[act[idx[good]]])[0]
+                    good &= ll_c >= ll_a[idx]
+                p[act[idx[good]]] = cand[good]
+                moving[idx[good]] = False
+                lam[idx[~good]] /= 2
+            # no improving step left: at the optimum to numerical precision
+            stop |= moving
+            done[act[stop | bad]] = True
+            failed[act[bad]] = True
+            converged[cols[act[stop]]] = True
+        ll, h_n, _, _, G = _garch_pass(Z, p, bc, scores=True)
+        B = np.einsum('tni,tnj->nij', G, G)
+        ok = ~failed & np.isfinite(ll) & np.isfinite(B).all(axis=(1, 2))
+        B[~ok] = np.eye(5)
+        with np.errstate(invalid='ignore'):
+            se_u = np.sqrt(np.diagonal(np.linalg.pinv(B, hermitian=True), axis1=1, axis2=2))
+        cols, to_unit, scale = cols[ok], to_unit[ok], scale[ok]
+        params[cols] = p[ok] / to_unit
+        se[cols] = se_u[ok] / to_unit
+        loglik[cols] = ll[ok] - (T - 1) * np.log(scale)
+        h_next[cols] = h_n[ok] * scale ** 2
+    if single:
+        return GARCHFit(params[0], se[0], loglik[0], h_next[0], converged[0])
+    return GARCHFit(params, se, loglik, h_next, converged)
+
+def GARCH_variance_forecast(params, h_next, steps=1):
+    """
+    Closed-form GARCH(1,1) variance forecasts for the next steps dates:
+    E[h[T+k]] = vbar + (alpha + beta)^(k-1) (h[T+1] - vbar), vbar = omega /
+    (1 - alpha - beta). Returns (series, steps), or (steps,) for one series.
+    """
+    params = np.asarray(params, dtype=np.float64)
+    omega, alpha, beta = params[..., 2], params[..., 3], params[..., 4]
+    persistence = alpha + beta
+    vbar = omega / (1 - persistence)
+    k = np.arange(steps)
+    return vbar[..., None] + persistence[..., None] ** k * (np.asarray(h_next)[..., None] - vbar[..., None])
+
+def GARCH_rolling(returns, window, steps=1, refit_every=1, tol=1e-5, max_iter=200):
+    """
+    Rolling AR(1)-GARCH(1,1) variance forecasts: at every date from
+    window - 1 on, the forecasts h.1 ... h.steps made with the data up to
+    that date. Every refit_every dates all series are refitted at once on
+    the trailing window, warm-started from the previous fit; in between,
+    the variance recursion is rolled forward one date with the last
+    parameters. Series with missing values in a window are NaN until a
+    later refit succeeds.
+
+    Returns (forecasts (T, series, steps), params (T, series, 5)), with NaN
+    before the first window; for one series (T, steps) and (T, 5).
+    """
+    R = np.asarray(returns, dtype=np.float64)
+    single = R.ndim == 1
+    R = R[:, None] if single else R
+    T, n = R.shape
+    forecasts = np.full((T, n, steps), np.nan)
+    params_t = np.full((T, n, 5), np.nan)
+    params = None
+    h_next = np.full(n, np.nan)
+    for t in range(window - 1, T):
+        if (t - window + 1) % refit_every == 0:
+            fit = GARCH_fit(R[t - window + 1:t + 1], start=params, tol=tol, max_iter=max_iter)
+            params, h_next = fit.params, fit.h_next
+        else:
+            mu, phi, omega, alpha, beta = params.T
+            e = R[t] - mu - phi * R[t - 1]
+            h_next = omega + alpha * e ** 2 + beta * h_next
+        forecasts[t] = GARCH_variance_forecast(params, h_next, steps)
+        params_t[t] = params
+    if single:
+        return forecasts[:, 0], params_t[:, 0]
+    return forecasts, params_t
+
+def Heston(S0, v0, mu, kappa, theta, xi, rho, T, dt, n_paths=None, rng=None, shocks="normal", scheme="qe"):
+    """
+    Heston paths dS = mu S dt + sqrt(v) S dW1, dv = kappa (theta - v) dt
+    + xi sqrt(v) dW2, d<W1, W2> = rho dt, for all paths at once.
+
+    scheme: "qe" (Andersen's quadratic-exponential variance step with the
+    matching log-price step, gamma1 = gamma2 = 1/2) or "full_truncation"
+    (log-Euler with v+ in drift and diffusion). rng/shocks as in AssetModels.
+
+    Returns (S, v): (N + 1,) each for one path, (n_paths, N + 1) otherwise.
+    S can be passed straight to the Hedging engine, e.g. to delta-hedge at a
+    constant vol under stochastic volatility.
+    """
+    import AssetModels
+    if scheme not in ("qe", "full_truncation"):
+        raise ValueError("scheme must be 'qe' or 'full_truncation'")
+    N = int(T / dt)
+    n = 1 if n_paths is None else n_paths
+    Z = AssetModels.normals((n, N, 2), rng, shocks)
+    x = np.empty((n, N + 1))
+    v = np.empty((n, N + 1))
+    x[:, 0] = np.log(S0)
+    v[:, 0] = v0
+
+    if scheme == "qe":
+        k1 = 0.5 * dt * (kappa * rho / xi - 0.5) - rho / xi
+        k2 = 0.5 * dt * (kappa * rho / xi - 0.5) + rho / xi
+        k3 = 0.5 * dt * (1 - rho ** 2)
+        k0 = (mu - rho * kappa * theta / xi) * dt
+        for i in range(N):
+            v[:, i + 1] = AssetModels._qe_step(v[:, i], kappa, theta, xi, dt, Z[:, i, 0])
+            x[:, i + 1] = x[:, i] + k0 + k1 * v[:, i] + k2 * v[:, i + 1] + np.sqrt(k3 * (v[:, i] + v[:, i + 1])) * Z[:, i, 1]
+    else:
+        for i in range(N):
+            pos = np.maximum(v[:, i], 0)
+            z_v = Z[:, i, 0]
+            z_s = rho * z_v + np.sqrt(1 - rho ** 2) * Z[:, i, 1]
+            v[:, i + 1] = v[:, i] + kappa * (theta - pos) * dt + xi * np.sqrt(pos * dt) * z_v
+            x[:, i + 1] = x[:, i] + (mu - 0.5 * pos) * dt + np.sqrt(pos * dt) * z_s
+        v = np.maximum(v, 0)
+
+    S = np.exp(x)
+    return (S[0], v[0]) if n_paths is None else (S, v)
+
+def SABR(F0, alpha0, beta, nu, rho, T, dt, n_paths=None, rng=None, shocks="normal"):
+    """
+    SABR paths dF = alpha F^beta dW1, dalpha = nu alpha dW2, d<W1, W2> =
+    rho dt, for all paths at once. alpha is simulated exactly (lognormal),
+    F by Euler (log-Euler when beta = 1) and absorbed at zero.
+
+    Returns (F, alpha): (N + 1,) each for one path, (n_paths, N + 1) otherwise.
+    """
+    import AssetModels
+    N = int(T / dt)
+    n = 1 if n_paths is None else n_paths
+    Z = AssetModels.normals((n, N, 2), rng, shocks)
+    dW2 = Z[..., 0] * np.sqrt(dt)
+    dW1 = (rho * Z[..., 0] + np.sqrt(1 - rho ** 2) * Z[..., 1]) * np.sqrt(dt)
+
+    log_alpha = np.log(alpha0) + np.cumsum(nu * dW2 - 0.5 * nu ** 2 * dt, axis=1)
+    alpha = np.concatenate([np.full((n, 1), float(alpha0)), np.exp(log_alpha)], axis=1)
+    F = np.empty((n, N + 1))
+    F[:, 0] = F0
+    for i in range(N):
+        a = alpha[:, i]
+        if beta == 1:
+            F[:, i + 1] = F[:, i] * np.exp(a * dW1[:, i] - 0.5 * a ** 2 * dt)
+        else:
+            f = F[:, i]
+            F[:, i + 1] = np.where(f > 0, np.maximum(f + a * f ** beta * dW1[:, i], 0.0), 0.0)
+    return (F[0], alpha[0]) if n_paths is None else (F, alpha)